@@ -0,0 +1,259 @@
+# app/audit.py
+"""
+Ledger consistency auditor.
+
+Recomputes every group's pairwise balances from expense shares and
+settlements (hot and archived) and diffs them against the incrementally
+maintained balances table. Groups are split into contiguous group_id ranges
+(so every shard query can use the group_id indexes); each range is streamed
+in chunks and recomputed in its own worker process with its own DB
+connection, reading ledger and balances from one REPEATABLE READ snapshot.
+Pairs are compared on their net amount (a owes b minus b owes a), so the
+direction a debt happens to be stored in does not matter. Repairs are
+applied as deltas, so writes made after the audit are never overwritten.
+Self-owed rows (user_id == owes_to_id) can never be right; they are
+reported on their own and deleted by --repair.
+
+Usage:
+    python -m app.audit                          # audit everything
+    python -m app.audit --since 2026-10-01       # only groups with newer activity
+    python -m app.audit --workers 8 --repair     # fix mismatches in batches
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from sqlalchemy import func, select, text, union, union_all
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import crud, fx, models, database
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+STREAM_CHUNK_SIZE = 5000
+REPAIR_BATCH_SIZE = 500
+# Ranges per worker, so one busy range does not leave the other workers idle
+RANGES_PER_WORKER = 4
+# Net pair differences below this are float noise, not drift
+TOLERANCE = 0.01
+
+
+def _add_pair(net, group_id, debtor, creditor, amount):
+    """Accumulate 'debtor owes creditor amount' on the canonical (low id, high id) key."""
+    if debtor < creditor:
+        net[(group_id, debtor, creditor)] += amount
+    else:
+        net[(group_id, creditor, debtor)] -= amount
+
+
+def _group_filter(column, low, high, since):
+    conditions = [column.between(low, high)]
+    if since is not None:
+        recent = union(
+            select(models.Expense.group_id).where(models.Expense.created_at >= since),
+            select(models.Settlement.group_id).where(models.Settlement.created_at >= since),
+        )
+        conditions.append(column.in_(recent))
+    return conditions
+
+
+def _init_worker():
+    # Connections inherited from the parent process must not be reused
+    database.engine.dispose(close=False)
+
+
+def _begin_snapshot(db: Session):
+    """Start a transaction whose reads all see the same committed state."""
+    if db.get_bind().dialect.name == "sqlite":
+        # pysqlite only opens a transaction on writes; BEGIN pins the read snapshot
+        db.execute(text("BEGIN"))
+    else:
+        db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+
+
+def group_ranges(db: Session, count: int):
+    """Split [min(groups.id), max(groups.id)] into at most `count` contiguous (low, high) ranges."""
+    low, high = db.execute(select(func.min(models.Group.id), func.max(models.Group.id))).one()
+    if low is None:
+        return []
+    step = max(-(-(high - low + 1) // count), 1)
+    return [(start, min(start + step - 1, high)) for start in range(low, high + 1, step)]
+
+
+def audit_shard(low: int, high: int, since=None, chunk_size: int = STREAM_CHUNK_SIZE):
+    """
+    Recompute and diff the groups with low <= group_id <= high.
+    Returns (ledger_rows_scanned, groups_seen, [((group, a, b), stored_net, expected_net), ...],
+    [(balance_id, group, user, amount), ...] of self-owed rows).
+    """
+    db = database.SessionLocal()
+    try:
+        _begin_snapshot(db)
+        fx.rates.ensure_loaded(db)
+        base = dict(db.execute(
+            select(models.Group.id, models.Group.base_currency)
+            .where(*_group_filter(models.Group.id, low, high, since))
+        ).all())
+
+        hot = (
+            select(
+                models.Expense.group_id, models.Expense.paid_by_id, models.Expense.currency,
+                models.Expense.created_at, models.ExpenseShare.user_id, models.ExpenseShare.amount,
+            )
+            .join(models.ExpenseShare, models.ExpenseShare.expense_id == models.Expense.id)
+            .where(*_group_filter(models.Expense.group_id, low, high, since))
+        )
+        archived = (
+            select(
+                models.ArchivedExpense.group_id, models.ArchivedExpense.paid_by_id,
+                models.ArchivedExpense.currency, models.ArchivedExpense.created_at,
+                models.ArchivedExpenseShare.user_id, models.ArchivedExpenseShare.amount,
+            )
+            .join(models.ArchivedExpenseShare, models.ArchivedExpenseShare.expense_id == models.ArchivedExpense.id)
+            .where(*_group_filter(models.ArchivedExpense.group_id, low, high, since))
+        )
+
+        # A settlement is "payer owes payee -amount", in the same row shape as a share
+        settlements = [
+            select(
+                table.group_id, table.payee_id, table.currency, table.created_at,
+                table.payer_id, -table.amount,
+            ).where(*_group_filter(table.group_id, low, high, since))
+            for table in (models.Settlement, models.ArchivedSettlement)
+        ]
+
+        expected = defaultdict(float)
+        rows = 0
+        stream = db.execute(
+            union_all(hot, archived, *settlements).execution_options(yield_per=chunk_size)
+        )
+        for group_id, payer_id, currency, created_at, user_id, amount in stream:
+            rows += 1
+            if user_id == payer_id or group_id not in base:
+                continue
+            owed = fx.rates.convert(amount, currency, base[group_id], created_at)
+            _add_pair(expected, group_id, user_id, payer_id, owed)
+
+        stored = defaultdict(float)
+        self_pairs = []
+        for balance_id, group_id, user_id, owes_to_id, amount in db.execute(
+            select(
+                models.Balance.id, models.Balance.group_id, models.Balance.user_id,
+                models.Balance.owes_to_id, models.Balance.amount,
+            ).where(*_group_filter(models.Balance.group_id, low, high, since))
+        ):
+            if user_id == owes_to_id:
+                # Not a pair; netting it would flip its sign into the (u, u) key
+                self_pairs.append((balance_id, group_id, user_id, amount))
+                continue
+            _add_pair(stored, group_id, user_id, owes_to_id, amount)
+
+        diffs = [
+            (key, stored.get(key, 0.0), expected.get(key, 0.0))
+            for key in set(expected) | set(stored)
+            if abs(stored.get(key, 0.0) - expected.get(key, 0.0)) > TOLERANCE
+        ]
+        return rows, len(base), diffs, self_pairs
+    finally:
+        db.close()
+
+
+def repair(db: Session, diffs, self_pairs=()):
+    """
+    Move each mismatched pair's net by (expected - stored) through
+    crud.apply_balance_deltas, in batches of REPAIR_BATCH_SIZE pairs per
+    transaction. Relative updates keep writes committed since the audit.
+    Self-owed rows are deleted.
+    """
+    self_ids = [balance_id for balance_id, _, _, _ in self_pairs]
+    for start in range(0, len(self_ids), REPAIR_BATCH_SIZE):
+        try:
+            db.query(models.Balance).filter(
+                models.Balance.id.in_(self_ids[start:start + REPAIR_BATCH_SIZE])
+            ).delete(synchronize_session=False)
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Database error while deleting self-owed balances: {e}")
+            raise
+
+    repaired = 0
+    for start in range(0, len(diffs), REPAIR_BATCH_SIZE):
+        batch = diffs[start:start + REPAIR_BATCH_SIZE]
+        try:
+            crud.apply_balance_deltas(db, {
+                (group_id, low, high): expected - stored
+                for (group_id, low, high), stored, expected in batch
+            })
+            db.commit()
+            repaired += len(batch)
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Database error while repairing balances: {e}")
+            raise
+    return repaired
+
+
+def run_audit(workers: int, since=None, chunk_size: int = STREAM_CHUNK_SIZE, fix: bool = False):
+    start = time.perf_counter()
+    workers = max(workers, 1)
+    db = database.SessionLocal()
+    try:
+        ranges = group_ranges(db, workers * RANGES_PER_WORKER)
+    finally:
+        db.close()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        results = list(pool.map(
+            audit_shard, [low for low, _ in ranges], [high for _, high in ranges],
+            [since] * len(ranges), [chunk_size] * len(ranges),
+        ))
+    elapsed = time.perf_counter() - start
+
+    rows = sum(r for r, _, _, _ in results)
+    groups = sum(g for _, g, _, _ in results)
+    diffs = [d for _, _, shard_diffs, _ in results for d in shard_diffs]
+    self_pairs = [p for _, _, _, shard_self_pairs in results for p in shard_self_pairs]
+    logger.info(
+        f"Audited {groups} groups / {rows} ledger rows in {elapsed:.2f}s "
+        f"({rows / elapsed if elapsed else 0:.0f} rows/s, {workers} workers, {len(ranges)} ranges): "
+        f"{len(diffs)} mismatched pairs, {len(self_pairs)} self-owed rows"
+    )
+    for (group_id, low, high), stored, expected in diffs[:50]:
+        logger.warning(
+            f"Group {group_id}: users {low}->{high} stored net {stored:.2f}, expected {expected:.2f}"
+        )
+    for balance_id, group_id, user_id, amount in self_pairs[:50]:
+        logger.warning(f"Group {group_id}: user {user_id} owes themselves {amount:.2f} (balance {balance_id})")
+
+    if fix and (diffs or self_pairs):
+        db = database.SessionLocal()
+        try:
+            repaired = repair(db, diffs, self_pairs)
+        finally:
+            db.close()
+        logger.info(f"Repaired {repaired} pairs, deleted {len(self_pairs)} self-owed rows")
+    return diffs, self_pairs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audit stored balances against expense history")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--since", type=datetime.fromisoformat,
+                        help="only audit groups with expenses or settlements at or after this date")
+    parser.add_argument("--chunk-size", type=int, default=STREAM_CHUNK_SIZE)
+    parser.add_argument("--repair", action="store_true", help="correct mismatched balances")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+    diffs, self_pairs = run_audit(args.workers, args.since, args.chunk_size, args.repair)
+    return 1 if (diffs or self_pairs) and not args.repair else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
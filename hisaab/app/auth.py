@@ -41,6 +41,12 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return token
 
 
+def decode_access_token(token: str) -> Optional[str]:
+    """Return the username (`sub`) of a valid token. Raises JWTError if invalid."""
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    return payload.get("sub")
+
+
 # -------------------------
 # DB Dependency
 # -------------------------
@@ -94,8 +100,7 @@ def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
+        username = decode_access_token(token)
         if username is None:
             logger.warning("JWT decode failed: 'sub' missing in payload")
             raise credentials_exception
@@ -0,0 +1,116 @@
+# app/backfill_changes.py
+"""
+One-off backfill of the delta sync change log for existing data.
+
+Groups created before the change log existed have no group_changes rows,
+so `since=0` would only return what changed after the deploy. This first
+runs the schema upgrade (groups.change_seq, group_changes), then, group by
+group, records an insert for every member, expense, expense share and
+settlement (hot and archived) that has no change row yet. Sequence numbers
+come from the same counter live writers use, in batches of --batch-size per
+transaction, so the group row is only locked briefly and the backfill can
+run while the API is serving. Rows written after the deploy already have
+changes and are skipped, which also makes the backfill safe to re-run.
+
+Usage:
+    python -m app.backfill_changes [--batch-size 1000]
+"""
+import argparse
+import logging
+from sqlalchemy import select, union_all
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import crud, models, database, migrate_schema
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+BATCH_SIZE = 1000
+GROUP_PAGE_SIZE = 500
+
+
+def _existing_entities(group_id: int):
+    """(entity_type, entity_id) of every row the group's change log should cover, in apply order."""
+    expense_ids = union_all(
+        select(models.Expense.id).where(models.Expense.group_id == group_id),
+        select(models.ArchivedExpense.id).where(models.ArchivedExpense.group_id == group_id),
+    ).subquery()
+    return [
+        ("member", select(models.GroupMember.id).where(models.GroupMember.group_id == group_id)),
+        ("expense", select(expense_ids.c.id)),
+        ("expense_share", union_all(
+            select(models.ExpenseShare.id).where(models.ExpenseShare.expense_id.in_(select(expense_ids.c.id))),
+            select(models.ArchivedExpenseShare.id)
+            .where(models.ArchivedExpenseShare.expense_id.in_(select(expense_ids.c.id))),
+        )),
+        ("settlement", union_all(
+            select(models.Settlement.id).where(models.Settlement.group_id == group_id),
+            select(models.ArchivedSettlement.id).where(models.ArchivedSettlement.group_id == group_id),
+        )),
+    ]
+
+
+def backfill_group(db: Session, group_id: int, batch_size: int = BATCH_SIZE) -> int:
+    """Record inserts for the group's rows that have no change yet. Returns the number recorded."""
+    recorded = set(
+        db.execute(
+            select(models.GroupChange.entity_type, models.GroupChange.entity_id)
+            .where(models.GroupChange.group_id == group_id)
+        ).all()
+    )
+    pending = [
+        (entity_type, entity_id, "insert")
+        for entity_type, query in _existing_entities(group_id)
+        for entity_id in sorted(db.scalars(query))
+        if (entity_type, entity_id) not in recorded
+    ]
+    db.rollback()   # end the read transaction before taking the group lock per batch
+
+    for start in range(0, len(pending), batch_size):
+        try:
+            crud.record_changes(db, group_id, pending[start:start + batch_size])
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Database error while backfilling changes for group {group_id}: {e}")
+            raise
+    return len(pending)
+
+
+def backfill(db: Session, batch_size: int = BATCH_SIZE) -> int:
+    """Backfill every group in id order. Returns the number of changes recorded."""
+    total = 0
+    last_id = 0
+    while True:
+        group_ids = db.scalars(
+            select(models.Group.id).where(models.Group.id > last_id).order_by(models.Group.id).limit(GROUP_PAGE_SIZE)
+        ).all()
+        if not group_ids:
+            break
+        last_id = group_ids[-1]
+        for group_id in group_ids:
+            count = backfill_group(db, group_id, batch_size)
+            if count:
+                logger.info(f"Group {group_id}: backfilled {count} changes")
+            total += count
+    logger.info(f"Change log backfill finished: {total} changes recorded")
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record change log entries for data that predates delta sync")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+    migrate_schema.upgrade()
+    db = database.SessionLocal()
+    try:
+        backfill(db, args.batch_size)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
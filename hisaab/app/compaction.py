@@ -0,0 +1,232 @@
+# app/compaction.py
+"""
+Compaction of fully settled group history.
+
+Replays a group's expenses and settlements in time order, keeps a running
+net balance per member and remembers the last moment after which every
+balance was zero. Everything up to that point is moved into the archive
+tables and a GroupCheckpoint is written, so hot tables only hold history
+that still affects balances.
+
+Usage:
+    python -m app.compaction                # every group
+    python -m app.compaction --group-id 7   # a single group
+"""
+import argparse
+import logging
+from collections import defaultdict
+from sqlalchemy import delete, func, insert, literal, select, union, union_all
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import fx, models, database
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Balances within this distance of zero count as settled (float rounding)
+SETTLED_EPSILON = 0.01
+STREAM_CHUNK_SIZE = 1000
+
+
+def _ledger_entries(group_id: int):
+    """Per-user balance deltas of a group's expenses and settlements, in time order."""
+    expense_paid = select(
+        models.Expense.created_at, literal(0).label("kind"), models.Expense.id,
+        models.Expense.paid_by_id, models.Expense.amount, models.Expense.currency,
+    ).where(models.Expense.group_id == group_id)
+    expense_owed = (
+        select(
+            models.Expense.created_at, literal(0).label("kind"), models.Expense.id,
+            models.ExpenseShare.user_id, -models.ExpenseShare.amount, models.Expense.currency,
+        )
+        .join(models.ExpenseShare, models.ExpenseShare.expense_id == models.Expense.id)
+        .where(models.Expense.group_id == group_id)
+    )
+    settlement_paid = select(
+        models.Settlement.created_at, literal(1).label("kind"), models.Settlement.id,
+        models.Settlement.payer_id, models.Settlement.amount, models.Settlement.currency,
+    ).where(models.Settlement.group_id == group_id)
+    settlement_received = select(
+        models.Settlement.created_at, literal(1).label("kind"), models.Settlement.id,
+        models.Settlement.payee_id, -models.Settlement.amount, models.Settlement.currency,
+    ).where(models.Settlement.group_id == group_id)
+    entries = union_all(expense_paid, expense_owed, settlement_paid, settlement_received).subquery()
+    return select(entries).order_by(*list(entries.c)[:3])
+
+
+def find_settled_point(db: Session, group_id: int):
+    """
+    Return (created_at, entry_count) for the latest moment after which every
+    member's net balance was zero, or None if there is no such point.
+    Expenses and settlements are replayed in time order; amounts are
+    converted into the group's base currency at the entry date.
+    """
+    base = db.scalar(select(models.Group.base_currency).where(models.Group.id == group_id))
+    fx.rates.ensure_loaded(db)
+    rows = db.execute(_ledger_entries(group_id).execution_options(yield_per=STREAM_CHUNK_SIZE))
+
+    net = defaultdict(float)
+    settled = None
+    unset = object()
+    current_at = unset
+    last_entry = None
+    count = 0
+
+    def is_settled():
+        return current_at is not unset and all(abs(v) < SETTLED_EPSILON for v in net.values())
+
+    for created_at, kind, entry_id, user_id, delta, currency in rows:
+        # Only cut between distinct timestamps, never inside a tie
+        if created_at != current_at:
+            if is_settled():
+                settled = (current_at, count)
+            current_at = created_at
+        if (kind, entry_id) != last_entry:
+            last_entry = (kind, entry_id)
+            count += 1
+        net[user_id] += fx.rates.convert(delta, currency, base, created_at)
+
+    if is_settled():
+        settled = (current_at, count)
+    return settled
+
+
+def _move(db: Session, source, target, columns, condition, checkpoint_id):
+    """INSERT ... SELECT `columns` of matching rows into the archive table. Returns the row count."""
+    return db.execute(
+        insert(target).from_select(
+            columns + ["checkpoint_id"],
+            select(*[getattr(source, c) for c in columns], literal(checkpoint_id)).where(condition),
+        )
+    ).rowcount
+
+
+def compact_group(db: Session, group_id: int):
+    """
+    Archive a group's history up to its latest settled point.
+    Returns the new GroupCheckpoint, or None if nothing could be archived.
+
+    The group row is locked for the whole replay-and-move transaction; every
+    writer bumps groups.change_seq before committing, so no (possibly
+    backdated) expense or settlement can commit in between. As a second guard
+    the number of rows moved must match the replayed entry count.
+    """
+    try:
+        locked = db.scalar(
+            select(models.Group.id).where(models.Group.id == group_id).with_for_update()
+        )
+        if locked is None:
+            db.rollback()
+            return None
+        point = find_settled_point(db, group_id)
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Database error while replaying group {group_id}: {e}")
+        raise
+    if point is None or point[0] is None:
+        db.rollback()
+        logger.info(f"Group {group_id}: no settled point, nothing to compact")
+        return None
+
+    through_created_at, replayed = point
+    archived = (models.Expense.group_id == group_id) & (models.Expense.created_at <= through_created_at)
+    archived_ids = select(models.Expense.id).where(archived)
+    archived_settlements = (
+        (models.Settlement.group_id == group_id) & (models.Settlement.created_at <= through_created_at)
+    )
+
+    try:
+        checkpoint = models.GroupCheckpoint(
+            group_id=group_id,
+            through_expense_id=db.scalar(select(func.max(models.Expense.id)).where(archived)) or 0,
+            through_created_at=through_created_at,
+        )
+        db.add(checkpoint)
+        db.flush()
+
+        moved = _move(
+            db, models.Expense, models.ArchivedExpense,
+            ["id", "description", "amount", "currency", "paid_by_id", "group_id", "created_at"],
+            archived, checkpoint.id,
+        )
+        share_cols = ["id", "expense_id", "user_id", "amount"]
+        db.execute(
+            insert(models.ArchivedExpenseShare).from_select(
+                share_cols,
+                select(*[getattr(models.ExpenseShare, c) for c in share_cols]).where(
+                    models.ExpenseShare.expense_id.in_(archived_ids)
+                ),
+            )
+        )
+        settled = _move(
+            db, models.Settlement, models.ArchivedSettlement,
+            ["id", "group_id", "payer_id", "payee_id", "amount", "currency", "created_at"],
+            archived_settlements, checkpoint.id,
+        )
+        db.execute(
+            delete(models.ExpenseShare)
+            .where(models.ExpenseShare.expense_id.in_(archived_ids))
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(delete(models.Expense).where(archived).execution_options(synchronize_session=False))
+        db.execute(
+            delete(models.Settlement).where(archived_settlements).execution_options(synchronize_session=False)
+        )
+
+        if moved + settled != replayed:
+            db.rollback()
+            logger.warning(
+                f"Group {group_id}: history changed during compaction "
+                f"({moved + settled} rows to archive, {replayed} replayed), skipped"
+            )
+            return None
+
+        checkpoint.archived_expenses = moved
+        db.commit()
+        logger.info(
+            f"Group {group_id}: archived {moved} expenses and {settled} settlements "
+            f"through {through_created_at}"
+        )
+        return checkpoint
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Database error while compacting group {group_id}: {e}")
+        raise
+
+
+def compact_all(db: Session):
+    """Compact every group that has hot history. Returns the checkpoints written."""
+    group_ids = db.scalars(
+        union(
+            select(models.Expense.group_id).where(models.Expense.group_id.isnot(None)),
+            select(models.Settlement.group_id),
+        )
+    ).all()
+    checkpoints = []
+    for group_id in group_ids:
+        checkpoint = compact_group(db, group_id)
+        if checkpoint is not None:
+            checkpoints.append(checkpoint)
+    logger.info(f"Compaction finished: {len(checkpoints)} of {len(group_ids)} groups compacted")
+    return checkpoints
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive fully settled group history")
+    parser.add_argument("--group-id", type=int, help="compact only this group")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+    db = database.SessionLocal()
+    try:
+        if args.group_id is not None:
+            compact_group(db, args.group_id)
+        else:
+            compact_all(db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
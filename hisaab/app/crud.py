@@ -1,9 +1,11 @@
 # app/crud.py
 import logging
+from collections import defaultdict
+from sqlalchemy import func, select, union_all, update
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from passlib.hash import bcrypt
-from . import models, schemas
+from . import fx, models, schemas
 
 # Logger
 logger = logging.getLogger(__name__)
@@ -49,3 +51,445 @@ def get_user_by_email(db: Session, email: str):
     except SQLAlchemyError as e:
         logger.error(f"DB error in get_user_by_email for {email}: {e}")
         raise
+
+
+# -------------------------
+# Group balances (batched)
+# -------------------------
+def get_authorized_group_ids(db: Session, user_id: int, group_ids=None):
+    """
+    Resolve which of `group_ids` exist and which of those `user_id` belongs to,
+    in a single query. `group_ids=None` means every group the user is in.
+    Returns ({group_id: (name, base_currency)} for existing groups, set of member group ids).
+    """
+    try:
+        membership = (
+            db.query(models.GroupMember.group_id)
+            .filter(models.GroupMember.user_id == user_id)
+            .subquery()
+        )
+        query = db.query(
+            models.Group.id, models.Group.name, models.Group.base_currency, membership.c.group_id
+        ).outerjoin(
+            membership, membership.c.group_id == models.Group.id
+        )
+        if group_ids is None:
+            query = query.filter(membership.c.group_id.isnot(None))
+        else:
+            query = query.filter(models.Group.id.in_(group_ids))
+
+        existing, allowed = {}, set()
+        for group_id, name, base_currency, member_group_id in query.all():
+            existing[group_id] = (name, base_currency)
+            if member_group_id is not None:
+                allowed.add(group_id)
+        return existing, allowed
+    except SQLAlchemyError as e:
+        logger.error(f"DB error resolving groups for user {user_id}: {e}")
+        raise
+
+
+def get_group_members_bulk(db: Session, group_ids):
+    """Return {group_id: [(user_id, username), ...]} for all groups in one query."""
+    members = defaultdict(list)
+    if not group_ids:
+        return members
+    try:
+        rows = (
+            db.query(models.GroupMember.group_id, models.User.id, models.User.username)
+            .join(models.User, models.User.id == models.GroupMember.user_id)
+            .filter(models.GroupMember.group_id.in_(group_ids))
+            .all()
+        )
+        for group_id, user_id, username in rows:
+            members[group_id].append((user_id, username))
+        return members
+    except SQLAlchemyError as e:
+        logger.error(f"DB error loading members for groups {group_ids}: {e}")
+        raise
+
+
+def get_net_balances_bulk(db: Session, group_ids):
+    """
+    Net balance per (group, user) for many groups in one GROUP BY query:
+    amount paid minus share owed, plus settlements paid minus settlements
+    received. Positive = owed to them, negative = they owe.
+    Amounts are summed per (currency, day) in SQL and the totals converted into
+    each group's base currency from the FX cache.
+    Returns {group_id: {user_id: balance}}.
+    """
+    balances = defaultdict(dict)
+    if not group_ids:
+        return balances
+    try:
+        day = func.date(models.Expense.created_at)
+        paid = select(
+            models.Expense.group_id.label("group_id"),
+            models.Expense.paid_by_id.label("user_id"),
+            models.Expense.currency.label("currency"),
+            day.label("day"),
+            models.Expense.amount.label("delta"),
+        ).where(models.Expense.group_id.in_(group_ids))
+        owed = (
+            select(
+                models.Expense.group_id.label("group_id"),
+                models.ExpenseShare.user_id.label("user_id"),
+                models.Expense.currency.label("currency"),
+                day.label("day"),
+                (-models.ExpenseShare.amount).label("delta"),
+            )
+            .join(models.Expense, models.Expense.id == models.ExpenseShare.expense_id)
+            .where(models.Expense.group_id.in_(group_ids))
+        )
+        settlement_day = func.date(models.Settlement.created_at)
+        settled = select(
+            models.Settlement.group_id.label("group_id"),
+            models.Settlement.payer_id.label("user_id"),
+            models.Settlement.currency.label("currency"),
+            settlement_day.label("day"),
+            models.Settlement.amount.label("delta"),
+        ).where(models.Settlement.group_id.in_(group_ids))
+        received = select(
+            models.Settlement.group_id.label("group_id"),
+            models.Settlement.payee_id.label("user_id"),
+            models.Settlement.currency.label("currency"),
+            settlement_day.label("day"),
+            (-models.Settlement.amount).label("delta"),
+        ).where(models.Settlement.group_id.in_(group_ids))
+        entries = union_all(paid, owed, settled, received).subquery()
+        rows = db.execute(
+            select(
+                entries.c.group_id,
+                entries.c.user_id,
+                models.Group.base_currency,
+                entries.c.currency,
+                entries.c.day,
+                func.sum(entries.c.delta),
+            )
+            .join(models.Group, models.Group.id == entries.c.group_id)
+            .group_by(
+                entries.c.group_id,
+                entries.c.user_id,
+                models.Group.base_currency,
+                entries.c.currency,
+                entries.c.day,
+            )
+        ).all()
+
+        if any(currency != base for _, _, base, currency, _, _ in rows):
+            fx.rates.ensure_loaded(db)
+        for group_id, user_id, base, currency, on, total in rows:
+            amount = fx.rates.convert(float(total or 0.0), currency, base, on)
+            balances[group_id][user_id] = balances[group_id].get(user_id, 0.0) + amount
+        return balances
+    except SQLAlchemyError as e:
+        logger.error(f"DB error computing balances for groups {group_ids}: {e}")
+        raise
+
+
+# -------------------------
+# Expense listings (hot + archive)
+# -------------------------
+def get_expenses(db: Session, group_id=None, include_archived: bool = False):
+    """
+    Expenses, optionally limited to one group. With include_archived the
+    compacted history from the archive tables is returned first, in id order.
+    """
+    try:
+        query = db.query(models.Expense)
+        if group_id is not None:
+            query = query.filter(models.Expense.group_id == group_id)
+        expenses = query.order_by(models.Expense.id).all()
+        if not include_archived:
+            return expenses
+
+        archived_query = db.query(models.ArchivedExpense)
+        if group_id is not None:
+            archived_query = archived_query.filter(models.ArchivedExpense.group_id == group_id)
+        return archived_query.order_by(models.ArchivedExpense.id).all() + expenses
+    except SQLAlchemyError as e:
+        logger.error(f"DB error fetching expenses for group {group_id}: {e}")
+        raise
+
+
+# -------------------------
+# Startup warmup
+# -------------------------
+def warm_statements(db: Session):
+    """
+    Run the hot queries once against an id that never exists, so their compiled
+    SQL lands in SQLAlchemy's statement cache before the first real request.
+    """
+    get_user_by_username(db, "")
+    get_authorized_group_ids(db, 0, [0])
+    get_group_members_bulk(db, [0])
+    get_net_balances_bulk(db, [0])
+    get_expenses(db, group_id=0, include_archived=True)
+    db.rollback()
+
+
+# -------------------------
+# Expense shares & pairwise balances
+# -------------------------
+def split_equally(amount: float, split_between):
+    """Equal split of `amount`: [(user_id, share_amount), ...]."""
+    share = amount / len(split_between)
+    return [(user_id, share) for user_id in split_between]
+
+
+def add_expense_shares(db: Session, expense: models.Expense, split_between, base_currency: str):
+    """
+    Add equal ExpenseShare rows for a flushed `expense` and return the pairwise
+    balance deltas it implies, {(group_id, user_id, owes_to_id): amount}, in
+    the group's base currency.
+    """
+    deltas = defaultdict(float)
+    for user_id, share in split_equally(expense.amount, split_between):
+        db.add(models.ExpenseShare(expense_id=expense.id, user_id=user_id, amount=share))
+        if user_id != expense.paid_by_id:
+            owed = fx.rates.convert(share, expense.currency, base_currency, expense.created_at)
+            deltas[(expense.group_id, user_id, expense.paid_by_id)] += owed
+    return deltas
+
+
+def apply_balance_deltas(db: Session, deltas):
+    """
+    Add {(group_id, user_id, owes_to_id): amount} onto the balances table.
+
+    Each pair is an atomic `amount = amount + :delta` UPDATE, so concurrent
+    writers in the same group never lose each other's updates and nothing is
+    read or locked beyond the row being changed. Missing pairs are inserted
+    under a savepoint; if a concurrent writer inserted first, the UPDATE is
+    retried. Pairs are applied in sorted order so transactions touching the
+    same rows lock them in the same order.
+    """
+    try:
+        # Flush pending rows first so their errors are not mistaken for an insert race
+        db.flush()
+        for key in sorted(deltas):
+            group_id, user_id, owes_to_id = key
+            amount = deltas[key]
+            if _increment_balance(db, group_id, user_id, owes_to_id, amount):
+                logger.debug(f"Updated balance: {user_id} owes {owes_to_id} in group {group_id} by {amount:+}")
+                continue
+            try:
+                with db.begin_nested():
+                    db.add(models.Balance(group_id=group_id, user_id=user_id, owes_to_id=owes_to_id, amount=amount))
+                logger.debug(f"New balance created: {user_id} owes {owes_to_id} in group {group_id} → {amount}")
+            except IntegrityError:
+                _increment_balance(db, group_id, user_id, owes_to_id, amount)
+    except SQLAlchemyError as e:
+        logger.error(f"DB error applying balance deltas: {e}")
+        raise
+
+
+def _increment_balance(db: Session, group_id, user_id, owes_to_id, amount) -> bool:
+    result = db.execute(
+        update(models.Balance)
+        .where(
+            models.Balance.group_id == group_id,
+            models.Balance.user_id == user_id,
+            models.Balance.owes_to_id == owes_to_id,
+        )
+        .values(amount=models.Balance.amount + amount)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount > 0
+
+
+# -------------------------
+# Settlements & activity
+# -------------------------
+def get_settlements(db: Session, group_id: int, include_archived: bool = False):
+    """A group's settlements in time order, served from the (group_id, created_at) index."""
+    try:
+        settlements = (
+            db.query(models.Settlement)
+            .filter(models.Settlement.group_id == group_id)
+            .order_by(models.Settlement.created_at, models.Settlement.id)
+            .all()
+        )
+        if not include_archived:
+            return settlements
+        archived = (
+            db.query(models.ArchivedSettlement)
+            .filter(models.ArchivedSettlement.group_id == group_id)
+            .order_by(models.ArchivedSettlement.created_at, models.ArchivedSettlement.id)
+            .all()
+        )
+        return archived + settlements
+    except SQLAlchemyError as e:
+        logger.error(f"DB error fetching settlements for group {group_id}: {e}")
+        raise
+
+
+def get_group_activity(db: Session, group_id: int, entry_type: str = "all", limit: int = 50):
+    """
+    Newest-first feed of a group's expenses and/or settlements. Each type is
+    read separately through its (group_id, created_at) index and merged.
+    """
+    try:
+        entries = []
+        if entry_type in ("all", "expense"):
+            for e in (
+                db.query(models.Expense)
+                .filter(models.Expense.group_id == group_id)
+                .order_by(models.Expense.created_at.desc(), models.Expense.id.desc())
+                .limit(limit)
+            ):
+                entries.append({
+                    "entry_type": "expense", "id": e.id, "group_id": e.group_id,
+                    "description": e.description, "amount": e.amount, "currency": e.currency,
+                    "paid_by_id": e.paid_by_id, "payee_id": None, "created_at": e.created_at,
+                })
+        if entry_type in ("all", "settlement"):
+            for s in (
+                db.query(models.Settlement)
+                .filter(models.Settlement.group_id == group_id)
+                .order_by(models.Settlement.created_at.desc(), models.Settlement.id.desc())
+                .limit(limit)
+            ):
+                entries.append({
+                    "entry_type": "settlement", "id": s.id, "group_id": s.group_id,
+                    "description": None, "amount": s.amount, "currency": s.currency,
+                    "paid_by_id": s.payer_id, "payee_id": s.payee_id, "created_at": s.created_at,
+                })
+        entries.sort(key=lambda e: (e["created_at"], e["id"]), reverse=True)
+        return entries[:limit]
+    except SQLAlchemyError as e:
+        logger.error(f"DB error fetching activity for group {group_id}: {e}")
+        raise
+
+
+# -------------------------
+# Delta sync change log
+# -------------------------
+def record_changes(db: Session, group_id: int, changes):
+    """
+    Append [(entity_type, entity_id, op), ...] to the group's change log.
+    Sequence numbers come from an atomic bump of groups.change_seq; call this
+    last before commit so the group row is locked only briefly and sequence
+    order matches commit order.
+    """
+    if not changes:
+        return
+    try:
+        db.flush()
+        # One round trip while the group row is locked: bump and read back together
+        last = db.execute(
+            update(models.Group)
+            .where(models.Group.id == group_id)
+            .values(change_seq=models.Group.change_seq + len(changes))
+            .returning(models.Group.change_seq)
+            .execution_options(synchronize_session=False)
+        ).scalar_one()
+        first = last - len(changes) + 1
+        db.bulk_insert_mappings(models.GroupChange, [
+            {"group_id": group_id, "seq": first + i, "entity_type": entity_type, "entity_id": entity_id, "op": op}
+            for i, (entity_type, entity_id, op) in enumerate(changes)
+        ])
+    except SQLAlchemyError as e:
+        logger.error(f"DB error recording changes for group {group_id}: {e}")
+        raise
+
+
+def record_expense_changes(db: Session, expenses, op: str = "insert"):
+    """Record expenses and their shares (loaded with one IN query), one call per group."""
+    db.flush()
+    group_of = {expense.id: expense.group_id for expense in expenses}
+    by_group = defaultdict(list)
+    for expense_id, group_id in group_of.items():
+        by_group[group_id].append(("expense", expense_id, op))
+    for share_id, expense_id in (
+        db.query(models.ExpenseShare.id, models.ExpenseShare.expense_id)
+        .filter(models.ExpenseShare.expense_id.in_(list(group_of)))
+        .order_by(models.ExpenseShare.id)
+    ):
+        by_group[group_of[expense_id]].append(("expense_share", share_id, op))
+    for group_id in sorted(g for g in by_group if g is not None):
+        record_changes(db, group_id, by_group[group_id])
+
+
+# entity_type -> (hot model, archive model compaction moves rows to, serialized columns)
+_CHANGE_ENTITIES = {
+    "expense": (
+        models.Expense, models.ArchivedExpense,
+        ("id", "description", "amount", "currency", "paid_by_id", "group_id", "created_at"),
+    ),
+    "expense_share": (
+        models.ExpenseShare, models.ArchivedExpenseShare,
+        ("id", "expense_id", "user_id", "amount"),
+    ),
+    "settlement": (
+        models.Settlement, models.ArchivedSettlement,
+        ("id", "group_id", "payer_id", "payee_id", "amount", "currency", "created_at"),
+    ),
+}
+
+
+def _serialize_changed_rows(db: Session, entity_type: str, ids):
+    """
+    Current state of the changed rows of one type, fetched with one IN query.
+    Rows compaction has archived keep their id and are read from the archive
+    table with one more IN query.
+    """
+    if entity_type == "member":
+        rows = (
+            db.query(models.GroupMember.id, models.User.id, models.User.username)
+            .join(models.User, models.User.id == models.GroupMember.user_id)
+            .filter(models.GroupMember.id.in_(ids))
+        )
+        return {member_id: {"user_id": user_id, "username": username} for member_id, user_id, username in rows}
+    if entity_type not in _CHANGE_ENTITIES:
+        return {}
+
+    hot, archive, columns = _CHANGE_ENTITIES[entity_type]
+    found = {}
+    missing = set(ids)
+    for model in (hot, archive):
+        if not missing:
+            break
+        for row in db.execute(select(*[getattr(model, c) for c in columns]).where(model.id.in_(missing))):
+            found[row.id] = dict(row._mapping)
+        missing -= set(found)
+    return found
+
+
+def get_group_changes(db: Session, group_id: int, since: int = 0, limit: int = 500):
+    """
+    Changes with seq > since, oldest first, read from the (group_id, seq) index.
+    Inserts and updates carry the row's current state (from the archive
+    tables once compacted); deletes are tombstones with no data.
+    Returns (changes, has_more).
+    """
+    try:
+        page = (
+            db.query(models.GroupChange)
+            .filter(models.GroupChange.group_id == group_id, models.GroupChange.seq > since)
+            .order_by(models.GroupChange.seq)
+            .limit(limit + 1)
+            .all()
+        )
+        has_more = len(page) > limit
+        page = page[:limit]
+
+        ids_by_type = defaultdict(set)
+        for change in page:
+            if change.op != "delete":
+                ids_by_type[change.entity_type].add(change.entity_id)
+        rows = {t: _serialize_changed_rows(db, t, ids) for t, ids in ids_by_type.items()}
+
+        changes = [
+            {
+                "seq": change.seq,
+                "entity_type": change.entity_type,
+                "entity_id": change.entity_id,
+                "op": change.op,
+                "data": None if change.op == "delete" else rows[change.entity_type].get(change.entity_id),
+            }
+            for change in page
+        ]
+        return changes, has_more
+    except SQLAlchemyError as e:
+        logger.error(f"DB error fetching changes for group {group_id} since {since}: {e}")
+        raise
@@ -33,6 +33,19 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def warm_pool(size=None):
+    """Open (and return to the pool) `size` connections so first requests skip connect."""
+    size = size or getattr(engine.pool, "size", lambda: 1)()
+    connections = []
+    try:
+        for _ in range(size):
+            connections.append(engine.connect())
+    finally:
+        for conn in connections:
+            conn.close()
+    return len(connections)
+
+
 # ✅ Dependency for DB sessions
 def get_db():
     db = SessionLocal()
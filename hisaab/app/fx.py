@@ -0,0 +1,172 @@
+# app/fx.py
+"""
+Foreign-exchange rates for multi-currency groups.
+
+Rates live in the fx_rates table as units of currency per 1 USD per day and
+are loaded once into an in-memory, date-indexed cache. Conversions never hit
+the database, so callers aggregate amounts per (currency, day) first and
+convert the totals in one pass.
+
+Rate files are plain CSV (date,currency,per_usd) and imported offline:
+    python -m app.fx import rates.csv
+"""
+import argparse
+import csv
+import logging
+import threading
+import time
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date, datetime
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import models, database
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+PIVOT_CURRENCY = "USD"
+DEFAULT_CURRENCY = "INR"
+# Workers pick up newly imported rate files after at most this long
+CACHE_TTL_SECONDS = 3600
+
+
+class UnknownCurrencyError(ValueError):
+    pass
+
+
+def _as_date(value):
+    if value is None:
+        return date.today()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+class FxRateCache:
+    """currency -> (sorted dates, rates); lookups use the latest rate on or before a day."""
+
+    def __init__(self):
+        self._rates = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def load(self, db: Session):
+        rows = (
+            db.query(models.FxRate.currency, models.FxRate.rate_date, models.FxRate.per_usd)
+            .order_by(models.FxRate.currency, models.FxRate.rate_date)
+            .all()
+        )
+        rates = {}
+        for currency, rate_date, per_usd in rows:
+            dates, values = rates.setdefault(currency, ([], []))
+            dates.append(rate_date)
+            values.append(per_usd)
+        with self._lock:
+            self._rates = rates
+            self._loaded_at = time.monotonic()
+        logger.info(f"Loaded {len(rows)} FX rates for {len(rates)} currencies")
+
+    def ensure_loaded(self, db: Session = None):
+        """(Re)load when empty or older than CACHE_TTL_SECONDS."""
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < CACHE_TTL_SECONDS:
+            return
+        if db is not None:
+            self.load(db)
+            return
+        db = database.SessionLocal()
+        try:
+            self.load(db)
+        finally:
+            db.close()
+
+    def has(self, currency: str) -> bool:
+        return currency == PIVOT_CURRENCY or currency in self._rates
+
+    def supports(self, db: Session, from_currency: str, to_currency: str) -> bool:
+        """Whether `from_currency` amounts can be converted into `to_currency` (loads rates if needed)."""
+        if from_currency == to_currency:
+            return True
+        self.ensure_loaded(db)
+        if self.has(from_currency) and self.has(to_currency):
+            return True
+        logger.warning(f"No FX rates for {from_currency} -> {to_currency}")
+        return False
+
+    def rate(self, currency: str, on) -> float:
+        """Units of `currency` per 1 USD on day `on` (earliest known rate if `on` predates them)."""
+        if currency == PIVOT_CURRENCY:
+            return 1.0
+        try:
+            dates, values = self._rates[currency]
+        except KeyError:
+            raise UnknownCurrencyError(f"No FX rates loaded for {currency}")
+        index = bisect_right(dates, _as_date(on)) - 1
+        return values[max(index, 0)]
+
+    def convert(self, amount: float, from_currency: str, to_currency: str, on=None) -> float:
+        if from_currency == to_currency:
+            return amount
+        return amount / self.rate(from_currency, on) * self.rate(to_currency, on)
+
+    def convert_totals(self, totals, to_currency: str) -> float:
+        """Sum (currency, day, amount) triples into `to_currency`."""
+        return sum(self.convert(amount, currency, to_currency, on) for currency, on, amount in totals)
+
+
+rates = FxRateCache()
+
+
+# -------------------------
+# Rate file import
+# -------------------------
+def import_rates(db: Session, path: str) -> int:
+    """Upsert a date,currency,per_usd CSV into fx_rates. Returns the number of rows written."""
+    by_currency = defaultdict(dict)
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            currency = row["currency"].strip().upper()
+            by_currency[currency][date.fromisoformat(row["date"].strip())] = float(row["per_usd"])
+
+    try:
+        written = 0
+        for currency, day_rates in by_currency.items():
+            db.query(models.FxRate).filter(
+                models.FxRate.currency == currency,
+                models.FxRate.rate_date.in_(list(day_rates)),
+            ).delete(synchronize_session=False)
+            db.bulk_insert_mappings(
+                models.FxRate,
+                [{"currency": currency, "rate_date": d, "per_usd": r} for d, r in day_rates.items()],
+            )
+            written += len(day_rates)
+        db.commit()
+        logger.info(f"Imported {written} FX rates for {len(by_currency)} currencies from {path}")
+        return written
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Database error while importing FX rates from {path}: {e}")
+        raise
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage local FX rate tables")
+    sub = parser.add_subparsers(dest="command", required=True)
+    import_cmd = sub.add_parser("import", help="import a date,currency,per_usd CSV file")
+    import_cmd.add_argument("path")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+    models.Base.metadata.create_all(bind=database.engine, tables=[models.FxRate.__table__])
+    db = database.SessionLocal()
+    try:
+        import_rates(db, args.path)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
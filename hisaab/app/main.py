@@ -1,40 +1,116 @@
 # app/main.py
+import asyncio
 import logging
 import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app import models, database
+from fastapi.concurrency import run_in_threadpool
+from app import crud, fx, models, database, schemas
+from app.ratelimit import AdmissionControlMiddleware
 from app.auth import router as auth_router
 from app.routers import users as users_router
 from app.routers import expenses as expenses_router
 from app.routers import groups as groups_router
 from app.routers import settlements as settlements_router
+from app.routers import recurring as recurring_router
+from app.routers import health as health_router
 
-# ---------------- Logging Configuration ---------------- #
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler("app.log", mode="a")
-    ]
-)
 logger = logging.getLogger(__name__)
 
-# ---------------- FastAPI Initialization ---------------- #
-app = FastAPI()
+# Back-off between database initialization attempts while the DB is unreachable
+INIT_RETRY_INITIAL_DELAY = 1.0
+INIT_RETRY_MAX_DELAY = 30.0
+
+_logging_configured = False
+
+
+# ---------------- Logging Configuration ---------------- #
+def configure_logging():
+    global _logging_configured
+    if _logging_configured:
+        return
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s - %(message)s",
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler("app.log", mode="a")
+        ]
+    )
+    _logging_configured = True
 
-# Register routers
-app.include_router(auth_router, prefix="/auth", tags=["auth"])
-app.include_router(users_router.router, prefix="/users", tags=["users"])
-app.include_router(expenses_router.router, prefix="/expenses", tags=["expenses"])
-app.include_router(groups_router.router)
-app.include_router(settlements_router.router, prefix="/settlements", tags=["settlements"])
 
 # ---------------- Startup Tasks ---------------- #
-try:
+def init_database():
+    """Create tables, then warm the connection pool, hot statements, FX cache and validators."""
+    start = time.perf_counter()
     models.Base.metadata.create_all(bind=database.engine)
     logger.info("✅ Tables created successfully!")
-    logger.info("🚀 Application startup complete!")
-except Exception as e:
-    logger.critical(f"Application failed to start: {e}")
-    raise
+
+    opened = database.warm_pool()
+    db = database.SessionLocal()
+    try:
+        crud.warm_statements(db)
+        fx.rates.load(db)
+    finally:
+        db.close()
+    schemas.warm_validators()
+    logger.info(f"🔥 Warmup complete: {opened} pooled connections in {time.perf_counter() - start:.3f}s")
+
+
+async def _initialize_until_ready(app: FastAPI):
+    delay = INIT_RETRY_INITIAL_DELAY
+    while not app.state.ready:
+        try:
+            await run_in_threadpool(init_database)
+            app.state.ready = True
+            logger.info("🚀 Application is ready")
+        except Exception as e:
+            logger.error(f"Database initialization failed, retrying in {delay:.0f}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, INIT_RETRY_MAX_DELAY)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    app.state.ready = False
+
+    # First attempt runs inline so a healthy worker only serves once warmed up;
+    # if the database is briefly unavailable, keep retrying in the background
+    # and report not-ready on /readyz instead of crashing the worker.
+    retry_task = None
+    try:
+        await run_in_threadpool(init_database)
+        app.state.ready = True
+        logger.info("🚀 Application startup complete!")
+    except Exception as e:
+        logger.critical(f"Database unavailable at startup, serving as not ready: {e}")
+        retry_task = asyncio.create_task(_initialize_until_ready(app))
+
+    yield
+
+    if retry_task is not None:
+        retry_task.cancel()
+    database.engine.dispose()
+
+
+# ---------------- FastAPI Initialization ---------------- #
+def create_app() -> FastAPI:
+    app = FastAPI(lifespan=lifespan)
+    app.state.ready = False
+    app.add_middleware(AdmissionControlMiddleware)
+
+    # Register routers
+    app.include_router(health_router.router)
+    app.include_router(auth_router, prefix="/auth", tags=["auth"])
+    app.include_router(users_router.router, prefix="/users", tags=["users"])
+    app.include_router(expenses_router.router, prefix="/expenses", tags=["expenses"])
+    app.include_router(groups_router.router)
+    app.include_router(settlements_router.router, prefix="/settlements", tags=["settlements"])
+    app.include_router(recurring_router.router)
+    return app
+
+
+# Module-level instance for `uvicorn app.main:app`; startup work runs in the lifespan
+app = create_app()
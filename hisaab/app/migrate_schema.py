@@ -0,0 +1,90 @@
+# app/migrate_schema.py
+"""
+In-place schema upgrade for existing databases.
+
+create_all only creates missing tables; it never touches tables that
+already exist. This creates the missing tables, then compares every
+existing table with the models and adds the columns and indexes it lacks
+(e.g. expenses.currency and groups.base_currency). New NOT NULL columns
+are added with their server default, so existing rows get a value in the
+same statement. Safe to re-run; present columns and indexes are skipped.
+
+Usage:
+    python -m app.migrate_schema [--dry-run]
+"""
+import argparse
+import logging
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex
+
+from app import models, database
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def _add_column_sql(engine: Engine, table, column) -> str:
+    quote = engine.dialect.identifier_preparer.quote
+    sql = (
+        f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} "
+        f"{column.type.compile(dialect=engine.dialect)}"
+    )
+    if column.server_default is not None:
+        default = column.server_default.arg
+        sql += f" DEFAULT {default.text}" if hasattr(default, "text") else f" DEFAULT '{default}'"
+    if not column.nullable:
+        sql += " NOT NULL"
+    return sql
+
+
+def pending_statements(engine: Engine):
+    """DDL needed to bring the existing tables up to the models, in order."""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    statements = []
+    for table in models.Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        columns = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in columns:
+                continue
+            if not column.nullable and column.server_default is None:
+                logger.error(f"Cannot add {table.name}.{column.name}: NOT NULL without a server default")
+                continue
+            statements.append(_add_column_sql(engine, table, column))
+        indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            if index.name not in indexes:
+                statements.append(str(CreateIndex(index).compile(dialect=engine.dialect)))
+    return statements
+
+
+def upgrade(engine: Engine = None, dry_run: bool = False):
+    """Create missing tables, then add missing columns and indexes. Returns the DDL run."""
+    engine = engine or database.engine
+    if not dry_run:
+        models.Base.metadata.create_all(bind=engine)
+    statements = pending_statements(engine)
+    for sql in statements:
+        logger.info(f"{'Would run' if dry_run else 'Running'}: {sql}")
+    if statements and not dry_run:
+        with engine.begin() as conn:
+            for sql in statements:
+                conn.execute(text(sql))
+    logger.info(f"Schema upgrade finished: {len(statements)} statements")
+    return statements
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add missing tables, columns and indexes to an existing database")
+    parser.add_argument("--dry-run", action="store_true", help="only print the DDL")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+    upgrade(dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# app/migrate_settlements.py
+"""
+One-off migration of legacy settlements into the settlements table.
+
+Settlements used to be stored as Expense rows described
+"Settlement: User <payer> paid User <payee>", with a 0 share for the payer
+and a -amount share for the payee. This converts them in id-ordered
+batches: each batch inserts the Settlement rows, deletes the fake expenses
+and shares (recording delta-sync tombstones) and applies the balance deltas
+those settlements never made, in one transaction. Only rows with exactly
+that shape are converted; anything else the LIKE prefilter catches (e.g. a
+real expense "Settlement: User 2 paid User 1 for the cab") is logged and
+left alone. Safe to re-run; converted rows no longer match.
+
+Usage:
+    python -m app.migrate_settlements [--batch-size 1000]
+"""
+import argparse
+import logging
+import re
+from collections import defaultdict
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import crud, fx, models, database
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+BATCH_SIZE = 1000
+LEGACY_PATTERN = "Settlement: User % paid User %"
+LEGACY_RE = re.compile(r"^Settlement: User (\d+) paid User (\d+)$")
+# Share amounts within this distance count as equal (float rounding)
+AMOUNT_EPSILON = 0.01
+
+
+def _payee_of(expense, shares):
+    """Payee id if `expense` has the exact legacy settlement shape, else None."""
+    match = LEGACY_RE.match(expense.description)
+    if not match or expense.group_id is None:
+        return None
+    payer_id, payee_id = int(match.group(1)), int(match.group(2))
+    if payer_id != expense.paid_by_id or payer_id == payee_id or len(shares) != 2:
+        return None
+    by_user = {share.user_id: share.amount for share in shares}
+    if set(by_user) != {payer_id, payee_id}:
+        return None
+    if abs(by_user[payer_id]) > AMOUNT_EPSILON or abs(by_user[payee_id] + expense.amount) > AMOUNT_EPSILON:
+        return None
+    return payee_id
+
+
+def migrate(db: Session, batch_size: int = BATCH_SIZE) -> int:
+    """Convert all legacy settlement expenses. Returns the number converted."""
+    converted = 0
+    last_id = 0
+    fx.rates.ensure_loaded(db)
+    while True:
+        legacy = (
+            db.query(models.Expense)
+            .filter(models.Expense.description.like(LEGACY_PATTERN), models.Expense.id > last_id)
+            .order_by(models.Expense.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not legacy:
+            break
+        last_id = legacy[-1].id
+
+        try:
+            ids = [e.id for e in legacy]
+            shares = defaultdict(list)
+            for share in db.query(models.ExpenseShare).filter(models.ExpenseShare.expense_id.in_(ids)):
+                shares[share.expense_id].append(share)
+            bases = dict(
+                db.query(models.Group.id, models.Group.base_currency)
+                .filter(models.Group.id.in_({e.group_id for e in legacy}))
+                .all()
+            )
+
+            deltas = defaultdict(float)
+            migrated, settlements = [], []
+            for expense in legacy:
+                payee_id = _payee_of(expense, shares[expense.id])
+                if payee_id is None:
+                    logger.warning(f"Expense {expense.id} is not a legacy settlement ({expense.description!r}), skipped")
+                    continue
+                settlements.append(models.Settlement(
+                    group_id=expense.group_id,
+                    payer_id=expense.paid_by_id,
+                    payee_id=payee_id,
+                    amount=expense.amount,
+                    currency=expense.currency,
+                    created_at=expense.created_at,
+                ))
+                paid = fx.rates.convert(expense.amount, expense.currency, bases[expense.group_id], expense.created_at)
+                deltas[(expense.group_id, expense.paid_by_id, payee_id)] -= paid
+                migrated.append(expense)
+
+            migrated_ids = [e.id for e in migrated]
+            if migrated_ids:
+                db.add_all(settlements)
+                db.flush()
+
+                # Tombstones for the fake expenses and shares, inserts for their settlements
+                changes = defaultdict(list)
+                for expense, settlement in zip(migrated, settlements):
+                    changes[expense.group_id].append(("expense", expense.id, "delete"))
+                    changes[expense.group_id].extend(
+                        ("expense_share", share.id, "delete") for share in shares[expense.id]
+                    )
+                    changes[expense.group_id].append(("settlement", settlement.id, "insert"))
+
+                db.query(models.ExpenseShare).filter(
+                    models.ExpenseShare.expense_id.in_(migrated_ids)
+                ).delete(synchronize_session=False)
+                db.query(models.Expense).filter(
+                    models.Expense.id.in_(migrated_ids)
+                ).delete(synchronize_session=False)
+                crud.apply_balance_deltas(db, deltas)
+                # Group rows last, after balance rows, in the same lock order as live writers
+                for group_id in sorted(changes):
+                    crud.record_changes(db, group_id, changes[group_id])
+            db.commit()
+            converted += len(migrated_ids)
+            logger.info(f"Converted {len(migrated_ids)} settlements (through expense {last_id})")
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Database error while migrating settlements after expense {ids[0]}: {e}")
+            raise
+    logger.info(f"Settlement migration finished: {converted} converted")
+    return converted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move legacy settlement expenses into the settlements table")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try:
+        migrate(db, args.batch_size)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 # app/models.py
 import logging
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Table
+from sqlalchemy import (
+    Column, Integer, String, Float, Boolean, ForeignKey, DateTime, Date, JSON, Index, Table, UniqueConstraint
+)
 from .database import Base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -14,11 +16,19 @@ group_members = Table(
     "group_members",
     Base.metadata,
     Column("id", Integer, primary_key=True, index=True),
-    Column("group_id", Integer, ForeignKey("groups.id")),
-    Column("user_id", Integer, ForeignKey("users.id")),
+    Column("group_id", Integer, ForeignKey("groups.id"), index=True),
+    Column("user_id", Integer, ForeignKey("users.id"), index=True),
 )
 
 
+class GroupMember(Base):
+    """Mapped view of the group_members association table for direct queries."""
+    __table__ = group_members
+
+    def __repr__(self):
+        return f"<GroupMember(group_id={self.group_id}, user_id={self.user_id})>"
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -37,12 +47,14 @@ class User(Base):
 
 class Expense(Base):
     __tablename__ = "expenses"
+    __table_args__ = (Index("ix_expenses_group_created", "group_id", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     description = Column(String(255), nullable=False)
     amount = Column(Float, nullable=False)
+    currency = Column(String(3), nullable=False, default="INR", server_default="INR")
     paid_by_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    group_id = Column(Integer, ForeignKey("groups.id"), nullable=True)
+    group_id = Column(Integer, ForeignKey("groups.id"), nullable=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     paid_by = relationship("User", back_populates="expenses_paid")
@@ -57,7 +69,7 @@ class ExpenseShare(Base):
     __tablename__ = "expense_shares"
 
     id = Column(Integer, primary_key=True, index=True)
-    expense_id = Column(Integer, ForeignKey("expenses.id"), nullable=False)
+    expense_id = Column(Integer, ForeignKey("expenses.id"), nullable=False, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     amount = Column(Float, nullable=False)
 
@@ -73,10 +85,192 @@ class Group(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(128), nullable=False)
+    base_currency = Column(String(3), nullable=False, default="INR", server_default="INR")
     created_by_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0")   # last GroupChange.seq
 
     members = relationship("User", secondary=group_members, back_populates="groups")
     expenses = relationship("Expense", back_populates="group")
 
     def __repr__(self):
         return f"<Group(id={self.id}, name='{self.name}')>"
+
+
+class Settlement(Base):
+    """Payment from payer to payee inside a group, reducing what payer owes payee."""
+    __tablename__ = "settlements"
+    __table_args__ = (Index("ix_settlements_group_created", "group_id", "created_at"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    group_id = Column(Integer, ForeignKey("groups.id"), nullable=False)
+    payer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    payee_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    amount = Column(Float, nullable=False)
+    currency = Column(String(3), nullable=False, default="INR", server_default="INR")
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Settlement(id={self.id}, payer_id={self.payer_id}, payee_id={self.payee_id}, amount={self.amount})>"
+
+
+class Balance(Base):
+    """Pairwise running balance inside a group: user_id owes owes_to_id `amount` (base currency)."""
+    __tablename__ = "balances"
+    __table_args__ = (UniqueConstraint("group_id", "user_id", "owes_to_id", name="uq_balances_pair"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    group_id = Column(Integer, ForeignKey("groups.id"), nullable=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    owes_to_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    amount = Column(Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<Balance(group_id={self.group_id}, user_id={self.user_id}, owes_to_id={self.owes_to_id}, amount={self.amount})>"
+
+
+# -------------------------
+# Archived (compacted) history
+# -------------------------
+class ArchivedExpense(Base):
+    """Expense moved out of the hot table once its group's history was settled to zero."""
+    __tablename__ = "archived_expenses"
+
+    id = Column(Integer, primary_key=True, index=True)
+    description = Column(String(255), nullable=False)
+    amount = Column(Float, nullable=False)
+    currency = Column(String(3), nullable=False, default="INR", server_default="INR")
+    paid_by_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    group_id = Column(Integer, ForeignKey("groups.id"), nullable=True, index=True)
+    created_at = Column(DateTime)
+    checkpoint_id = Column(Integer, ForeignKey("group_checkpoints.id"), nullable=False)
+
+    shares = relationship("ArchivedExpenseShare", back_populates="expense")
+
+    def __repr__(self):
+        return f"<ArchivedExpense(id={self.id}, description='{self.description}', amount={self.amount})>"
+
+
+class ArchivedExpenseShare(Base):
+    __tablename__ = "archived_expense_shares"
+
+    id = Column(Integer, primary_key=True, index=True)
+    expense_id = Column(Integer, ForeignKey("archived_expenses.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    amount = Column(Float, nullable=False)
+
+    expense = relationship("ArchivedExpense", back_populates="shares")
+
+    def __repr__(self):
+        return f"<ArchivedExpenseShare(id={self.id}, expense_id={self.expense_id}, user_id={self.user_id}, amount={self.amount})>"
+
+
+class ArchivedSettlement(Base):
+    __tablename__ = "archived_settlements"
+
+    id = Column(Integer, primary_key=True, index=True)
+    group_id = Column(Integer, ForeignKey("groups.id"), nullable=False, index=True)
+    payer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    payee_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    amount = Column(Float, nullable=False)
+    currency = Column(String(3), nullable=False, default="INR", server_default="INR")
+    created_at = Column(DateTime)
+    checkpoint_id = Column(Integer, ForeignKey("group_checkpoints.id"), nullable=False)
+
+    def __repr__(self):
+        return f"<ArchivedSettlement(id={self.id}, payer_id={self.payer_id}, payee_id={self.payee_id}, amount={self.amount})>"
+
+
+class GroupCheckpoint(Base):
+    """
+    Point in a group's history where every member's net balance was zero.
+    Every expense and settlement of the group created at or before
+    through_created_at lives in the archive tables, so balances are
+    recomputed from the hot tables alone.
+    """
+    __tablename__ = "group_checkpoints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    group_id = Column(Integer, ForeignKey("groups.id"), nullable=False, index=True)
+    through_expense_id = Column(Integer, nullable=False)
+    through_created_at = Column(DateTime, nullable=True)
+    archived_expenses = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<GroupCheckpoint(id={self.id}, group_id={self.group_id}, through_expense_id={self.through_expense_id})>"
+
+
+class FxRate(Base):
+    """Units of `currency` per 1 USD on `rate_date`, imported from local rate files."""
+    __tablename__ = "fx_rates"
+    __table_args__ = (UniqueConstraint("currency", "rate_date", name="uq_fx_rates_currency_date"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    currency = Column(String(3), nullable=False, index=True)
+    rate_date = Column(Date, nullable=False)
+    per_usd = Column(Float, nullable=False)
+
+    def __repr__(self):
+        return f"<FxRate(currency='{self.currency}', rate_date={self.rate_date}, per_usd={self.per_usd})>"
+
+
+# -------------------------
+# Recurring expenses
+# -------------------------
+class RecurringExpense(Base):
+    """Template materialized into a regular Expense at every occurrence of `schedule`."""
+    __tablename__ = "recurring_expenses"
+
+    id = Column(Integer, primary_key=True, index=True)
+    description = Column(String(255), nullable=False)
+    amount = Column(Float, nullable=False)
+    currency = Column(String(3), nullable=False, default="INR", server_default="INR")
+    paid_by_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    group_id = Column(Integer, ForeignKey("groups.id"), nullable=False, index=True)
+    split_between = Column(JSON, nullable=False)   # list of user IDs
+    schedule = Column(String(64), nullable=False)   # cron expression, e.g. "0 9 1 * *"
+    next_run_at = Column(DateTime, nullable=False, index=True)
+    last_run_at = Column(DateTime, nullable=True)
+    active = Column(Boolean, nullable=False, default=True)
+    created_by_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<RecurringExpense(id={self.id}, description='{self.description}', schedule='{self.schedule}')>"
+
+
+class RecurringOccurrence(Base):
+    """One materialized occurrence; the unique key makes materialization at-most-once."""
+    __tablename__ = "recurring_occurrences"
+    __table_args__ = (UniqueConstraint("recurring_id", "occurs_at", name="uq_recurring_occurrence"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    recurring_id = Column(Integer, ForeignKey("recurring_expenses.id"), nullable=False)
+    occurs_at = Column(DateTime, nullable=False)
+    expense_id = Column(Integer, nullable=True)   # may later move to archived_expenses
+
+    def __repr__(self):
+        return f"<RecurringOccurrence(recurring_id={self.recurring_id}, occurs_at={self.occurs_at})>"
+
+
+# -------------------------
+# Delta sync change log
+# -------------------------
+class GroupChange(Base):
+    """
+    One insert/update/delete of an expense, share, settlement or membership,
+    numbered by the group's monotonic change sequence for delta sync.
+    """
+    __tablename__ = "group_changes"
+    __table_args__ = (UniqueConstraint("group_id", "seq", name="uq_group_changes_seq"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    group_id = Column(Integer, ForeignKey("groups.id"), nullable=False)
+    seq = Column(Integer, nullable=False)
+    entity_type = Column(String(16), nullable=False)   # expense, expense_share, settlement, member
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String(8), nullable=False)   # insert, update, delete
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<GroupChange(group_id={self.group_id}, seq={self.seq}, {self.op} {self.entity_type} {self.entity_id})>"
@@ -0,0 +1,247 @@
+# app/ratelimit.py
+import abc
+import asyncio
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from jose import JWTError
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.auth import decode_access_token
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# -------------------------
+# Settings
+# -------------------------
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")   # "memory" or "sqlite"
+RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH", "ratelimit.sqlite3")
+RATE_LIMIT_RATE = float(os.getenv("RATE_LIMIT_RATE", "10"))      # tokens refilled per second
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "20"))    # bucket capacity
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "32"))
+QUEUE_DEADLINE_SECONDS = float(os.getenv("QUEUE_DEADLINE_SECONDS", "0.5"))
+# How often backends drop buckets that have refilled completely
+BUCKET_SWEEP_SECONDS = float(os.getenv("BUCKET_SWEEP_SECONDS", "60"))
+
+# Token cost per (method, path pattern); first match wins, everything else costs 1
+ROUTE_COSTS = [
+    ("GET", re.compile(r"^/expenses/expenses/?$"), 10),
+    ("GET", re.compile(r"^/users/me/balance$"), 5),
+    ("GET", re.compile(r"^/groups/balances$"), 3),
+    ("GET", re.compile(r"^/groups/\d+/expenses$"), 2),
+    ("GET", re.compile(r"^/expenses/expenses/group/\d+$"), 2),
+]
+
+# Never limited, so probes keep working while the service sheds load
+EXEMPT_PATHS = {"/healthz", "/readyz"}
+
+
+def _take(tokens, updated, now, cost, rate, burst):
+    """Token bucket step: returns (allowed, tokens_left, retry_after_seconds)."""
+    tokens = min(burst, tokens + (now - updated) * rate)
+    if tokens >= cost:
+        return True, tokens - cost, 0.0
+    return False, tokens, (cost - tokens) / rate
+
+
+# -------------------------
+# Storage backends
+# -------------------------
+class RateLimitBackend(abc.ABC):
+    """Token bucket storage. `blocking` backends are called from the threadpool."""
+
+    blocking = False
+
+    @abc.abstractmethod
+    def consume(self, key: str, cost: float, rate: float, burst: float):
+        """Take `cost` tokens from `key`'s bucket. Returns (allowed, retry_after)."""
+
+
+class InMemoryBackend(RateLimitBackend):
+    """
+    Per-process buckets. Each worker enforces its own limit. A full bucket is
+    the same as a missing one, so buckets that have refilled to `burst` are
+    swept every `sweep_interval` seconds to keep one-off clients from piling up.
+    """
+
+    def __init__(self, sweep_interval: float = BUCKET_SWEEP_SECONDS):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.sweep_interval = sweep_interval
+        self._last_sweep = time.monotonic()
+
+    def consume(self, key, cost, rate, burst):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            allowed, tokens, retry_after = _take(tokens, updated, now, cost, rate, burst)
+            self._buckets[key] = (tokens, now)
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep(now, rate, burst)
+        return allowed, retry_after
+
+    def _sweep(self, now, rate, burst):
+        full = [
+            key for key, (tokens, updated) in self._buckets.items()
+            if tokens + (now - updated) * rate >= burst
+        ]
+        for key in full:
+            del self._buckets[key]
+        self._last_sweep = now
+        if full:
+            logger.debug(f"Evicted {len(full)} idle rate limit buckets, {len(self._buckets)} left")
+
+
+class SQLiteBackend(RateLimitBackend):
+    """
+    Buckets in a local SQLite file shared by every worker process on the host.
+    Stand-in for a networked store; each update runs in a BEGIN IMMEDIATE transaction.
+    Like the in-memory backend, full buckets are deleted every `sweep_interval` seconds.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, sweep_interval: float = BUCKET_SWEEP_SECONDS):
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self._last_sweep = time.time()
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_buckets "
+            "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def consume(self, key, cost, rate, burst):
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated = row if row else (burst, now)
+            allowed, tokens, retry_after = _take(tokens, updated, now, cost, rate, burst)
+            conn.execute(
+                "INSERT INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            if now - self._last_sweep >= self.sweep_interval:
+                self._last_sweep = now
+                swept = conn.execute(
+                    "DELETE FROM rate_limit_buckets WHERE tokens + (? - updated) * ? >= ?",
+                    (now, rate, burst),
+                ).rowcount
+                if swept:
+                    logger.debug(f"Evicted {swept} idle rate limit buckets")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, retry_after
+
+
+def get_backend(name: str = RATE_LIMIT_BACKEND) -> RateLimitBackend:
+    if name == "memory":
+        return InMemoryBackend()
+    if name == "sqlite":
+        return SQLiteBackend(RATE_LIMIT_SQLITE_PATH)
+    raise ValueError(f"Unknown rate limit backend: {name}")
+
+
+# -------------------------
+# Middleware
+# -------------------------
+class AdmissionControlMiddleware(BaseHTTPMiddleware):
+    """
+    Per-principal token buckets weighted by route cost (429 when empty), then a
+    global concurrency limit: requests that cannot start within the queue
+    deadline are shed with 503 and a Retry-After header.
+    """
+
+    def __init__(
+        self,
+        app,
+        backend: RateLimitBackend = None,
+        rate: float = RATE_LIMIT_RATE,
+        burst: float = RATE_LIMIT_BURST,
+        max_concurrent: int = MAX_CONCURRENT_REQUESTS,
+        queue_deadline: float = QUEUE_DEADLINE_SECONDS,
+        route_costs: list = None,
+    ):
+        super().__init__(app)
+        self.backend = backend or get_backend()
+        self.rate = rate
+        self.burst = burst
+        self.queue_deadline = queue_deadline
+        self.route_costs = ROUTE_COSTS if route_costs is None else route_costs
+        self._slots = asyncio.Semaphore(max_concurrent)
+
+    @staticmethod
+    def principal(request) -> str:
+        """Same principal get_current_user resolves (token `sub`), else the client IP."""
+        auth = request.headers.get("authorization", "")
+        scheme, _, token = auth.partition(" ")
+        if scheme.lower() == "bearer" and token:
+            try:
+                username = decode_access_token(token)
+                if username:
+                    return f"user:{username}"
+            except JWTError:
+                pass
+        return f"ip:{request.client.host if request.client else 'unknown'}"
+
+    def cost(self, request) -> float:
+        path = request.url.path
+        for method, pattern, cost in self.route_costs:
+            if request.method == method and pattern.match(path):
+                return cost
+        return 1
+
+    async def dispatch(self, request, call_next):
+        if request.url.path in EXEMPT_PATHS:
+            return await call_next(request)
+
+        key = self.principal(request)
+        cost = min(self.cost(request), self.burst)
+        if self.backend.blocking:
+            allowed, retry_after = await run_in_threadpool(
+                self.backend.consume, key, cost, self.rate, self.burst
+            )
+        else:
+            allowed, retry_after = self.backend.consume(key, cost, self.rate, self.burst)
+        if not allowed:
+            logger.warning(f"Rate limit exceeded for {key} on {request.method} {request.url.path}")
+            return JSONResponse(
+                status_code=429,
+                content={"detail": "Too many requests"},
+                headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+            )
+
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_deadline)
+        except asyncio.TimeoutError:
+            logger.warning(f"Shedding {request.method} {request.url.path} for {key}: server busy")
+            return JSONResponse(
+                status_code=503,
+                content={"detail": "Server busy, retry later"},
+                headers={"Retry-After": str(max(1, int(self.queue_deadline + 0.999)))},
+            )
+        try:
+            return await call_next(request)
+        finally:
+            self._slots.release()
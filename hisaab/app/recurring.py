@@ -0,0 +1,199 @@
+# app/recurring.py
+"""
+Recurring expense scheduler.
+
+Every tick collects all due occurrences of every active RecurringExpense
+template (including ones missed while the scheduler was down), and
+materializes them in a single transaction: one batched insert of expenses,
+their shares, the occurrence markers and the aggregated balance updates.
+The unique (recurring_id, occurs_at) key on recurring_occurrences makes each
+occurrence at-most-once, even with several schedulers running.
+
+Usage:
+    python -m app.recurring               # run forever, one tick per minute
+    python -m app.recurring --once        # single tick (e.g. from system cron)
+"""
+import argparse
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from app import crud, fx, models, database
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+TICK_INTERVAL_SECONDS = 60
+# Upper bound of occurrences materialized per template in one tick (catch-up)
+MAX_CATCHUP_PER_TEMPLATE = 100
+# How far ahead next_after looks for a matching day before giving up
+MAX_LOOKAHEAD_DAYS = 366 * 5
+
+
+# -------------------------
+# Cron-like schedules
+# -------------------------
+class CronSchedule:
+    """
+    Five-field cron expression: minute hour day-of-month month day-of-week.
+    Fields accept *, numbers, lists (1,15), ranges (1-5) and steps (*/2).
+    Day-of-week is 0-6 with 0 = Sunday. As in cron, when both day fields are
+    restricted a day matches if either does.
+    """
+
+    FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+    def __init__(self, expression: str):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Schedule must have 5 fields, got {expression!r}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse(part, low, high) for part, (low, high) in zip(parts, self.FIELDS)
+        )
+        self.days_restricted = parts[2] != "*"
+        self.weekdays_restricted = parts[4] != "*"
+
+    @staticmethod
+    def _parse(field: str, low: int, high: int):
+        values = set()
+        for item in field.split(","):
+            base, _, step = item.partition("/")
+            if base == "*":
+                start, end = low, high
+            elif "-" in base:
+                start, end = (int(v) for v in base.split("-", 1))
+            else:
+                start = end = int(base)
+            if start < low or end > high or start > end:
+                raise ValueError(f"Value {item!r} out of range {low}-{high}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return sorted(values)
+
+    def _day_matches(self, day: datetime) -> bool:
+        if day.month not in self.months:
+            return False
+        dom = day.day in self.days
+        dow = (day.weekday() + 1) % 7 in self.weekdays
+        if self.days_restricted and self.weekdays_restricted:
+            return dom or dow
+        return dom and dow
+
+    def next_after(self, after: datetime) -> datetime:
+        """First matching minute strictly after `after`."""
+        start = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.replace(hour=0, minute=0)
+        for offset in range(MAX_LOOKAHEAD_DAYS):
+            candidate_day = day + timedelta(days=offset)
+            if not self._day_matches(candidate_day):
+                continue
+            for hour in self.hours:
+                for minute in self.minutes:
+                    candidate = candidate_day.replace(hour=hour, minute=minute)
+                    if candidate >= start:
+                        return candidate
+        raise ValueError(f"Schedule {self.expression!r} never fires")
+
+
+def due_occurrences(template: models.RecurringExpense, now: datetime):
+    """Occurrence times of `template` in [next_run_at, now], oldest first, capped."""
+    schedule = CronSchedule(template.schedule)
+    occurrences = []
+    occurs_at = template.next_run_at
+    while occurs_at <= now and len(occurrences) < MAX_CATCHUP_PER_TEMPLATE:
+        occurrences.append(occurs_at)
+        occurs_at = schedule.next_after(occurs_at)
+    return occurrences, occurs_at
+
+
+# -------------------------
+# Materialization
+# -------------------------
+def run_tick(db: Session, now: datetime = None) -> int:
+    """Materialize every due occurrence across all groups. Returns the number created."""
+    now = now or datetime.utcnow()
+    templates = (
+        db.query(models.RecurringExpense, models.Group.base_currency)
+        .join(models.Group, models.Group.id == models.RecurringExpense.group_id)
+        .filter(models.RecurringExpense.active.is_(True), models.RecurringExpense.next_run_at <= now)
+        .all()
+    )
+    if not templates:
+        return 0
+    if any(t.currency != base for t, base in templates):
+        fx.rates.ensure_loaded(db)
+
+    try:
+        # 1. One batched insert for all expense rows of this tick
+        pending = []
+        for template, base_currency in templates:
+            occurrences, next_run_at = due_occurrences(template, now)
+            for occurs_at in occurrences:
+                expense = models.Expense(
+                    description=template.description,
+                    amount=template.amount,
+                    currency=template.currency,
+                    paid_by_id=template.paid_by_id,
+                    group_id=template.group_id,
+                    created_at=occurs_at,
+                )
+                pending.append((template, base_currency, occurs_at, expense))
+            template.last_run_at = occurrences[-1]
+            template.next_run_at = next_run_at
+        db.add_all([expense for _, _, _, expense in pending])
+        db.flush()
+
+        # 2. Shares, occurrence markers and aggregated balance deltas
+        deltas = defaultdict(float)
+        for template, base_currency, occurs_at, expense in pending:
+            for key, amount in crud.add_expense_shares(
+                db, expense, template.split_between, base_currency
+            ).items():
+                deltas[key] += amount
+            db.add(models.RecurringOccurrence(
+                recurring_id=template.id, occurs_at=occurs_at, expense_id=expense.id
+            ))
+        crud.apply_balance_deltas(db, deltas)
+        crud.record_expense_changes(db, [expense for _, _, _, expense in pending])
+
+        db.commit()
+        logger.info(f"Materialized {len(pending)} recurring expenses from {len(templates)} templates")
+        return len(pending)
+    except IntegrityError as e:
+        # Another scheduler already materialized (some of) these occurrences
+        db.rollback()
+        logger.warning(f"Recurring tick skipped, occurrences already materialized: {e.orig}")
+        return 0
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Database error while materializing recurring expenses: {e}")
+        raise
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Materialize due recurring expenses")
+    parser.add_argument("--once", action="store_true", help="run a single tick and exit")
+    parser.add_argument("--interval", type=float, default=TICK_INTERVAL_SECONDS)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+    while True:
+        db = database.SessionLocal()
+        try:
+            run_tick(db)
+        except Exception as e:
+            logger.error(f"Recurring tick failed: {e}")
+            if args.once:
+                raise
+        finally:
+            db.close()
+        if args.once:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
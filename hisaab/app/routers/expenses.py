@@ -3,7 +3,7 @@ import logging
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
-from app import models, schemas, database
+from app import crud, fx, models, schemas, database
 
 router = APIRouter(prefix="/expenses", tags=["expenses"])
 
@@ -48,52 +48,34 @@ def create_expense(expense: schemas.ExpenseCreate, db: Session = Depends(get_db)
                 logger.warning(f"User {user_id} not in group {expense.group_id}")
                 raise HTTPException(status_code=400, detail=f"User {user_id} not in group")
 
-        # 4. Create expense
+        # 4. Validate currency (must be convertible into the group's base currency)
+        currency = expense.currency.upper()
+        if not fx.rates.supports(db, currency, group.base_currency):
+            raise HTTPException(status_code=400, detail=f"Unsupported currency {currency}")
+
+        # 5. Create expense
         db_expense = models.Expense(
             description=expense.description,
             amount=expense.amount,
+            currency=currency,
             paid_by_id=expense.paid_by_id,
             group_id=expense.group_id
         )
         db.add(db_expense)
-        db.commit()
-        db.refresh(db_expense)
-        logger.info(f"Expense {db_expense.id} created successfully")
+        db.flush()
 
-        # 5. Split equally & update balances
-        split_amount = expense.amount / len(expense.split_between)
-        logger.debug(f"Split amount per user: {split_amount}")
-
-        for user_id in expense.split_between:
-            share = models.ExpenseShare(
-                expense_id=db_expense.id,
-                user_id=user_id,
-                amount=split_amount
-            )
-            db.add(share)
-
-            if user_id != expense.paid_by_id:
-                balance = db.query(models.Balance).filter_by(
-                    user_id=user_id,
-                    owes_to_id=expense.paid_by_id
-                ).first()
-
-                if balance:
-                    balance.amount += split_amount
-                    logger.debug(f"Updated balance: {user_id} owes {expense.paid_by_id} → {balance.amount}")
-                else:
-                    balance = models.Balance(
-                        user_id=user_id,
-                        owes_to_id=expense.paid_by_id,
-                        amount=split_amount
-                    )
-                    db.add(balance)
-                    logger.debug(f"New balance created: {user_id} owes {expense.paid_by_id} → {split_amount}")
+        # 6. Split equally & update balances (same path as recurring materialization)
+        deltas = crud.add_expense_shares(db, db_expense, expense.split_between, group.base_currency)
+        crud.apply_balance_deltas(db, deltas)
+        crud.record_expense_changes(db, [db_expense])
 
         db.commit()
         db.refresh(db_expense)
+        logger.info(f"Expense {db_expense.id} created successfully")
         return db_expense
 
+    except HTTPException:
+        raise
     except SQLAlchemyError as e:
         db.rollback()
         logger.error(f"Database error while creating expense: {str(e)}", exc_info=True)
@@ -104,9 +86,9 @@ def create_expense(expense: schemas.ExpenseCreate, db: Session = Depends(get_db)
 
 
 @router.get("/", response_model=list[schemas.ExpenseOut])
-def get_expenses(db: Session = Depends(get_db)):
+def get_expenses(include_archived: bool = False, db: Session = Depends(get_db)):
     try:
-        expenses = db.query(models.Expense).all()
+        expenses = crud.get_expenses(db, include_archived=include_archived)
         logger.info(f"Retrieved {len(expenses)} expenses")
         return expenses
     except Exception as e:
@@ -115,9 +97,9 @@ def get_expenses(db: Session = Depends(get_db)):
 
 
 @router.get("/group/{group_id}", response_model=list[schemas.ExpenseOut])
-def get_group_expenses(group_id: int, db: Session = Depends(get_db)):
+def get_group_expenses(group_id: int, include_archived: bool = False, db: Session = Depends(get_db)):
     try:
-        expenses = db.query(models.Expense).filter(models.Expense.group_id == group_id).all()
+        expenses = crud.get_expenses(db, group_id=group_id, include_archived=include_archived)
         logger.info(f"Retrieved {len(expenses)} expenses for group {group_id}")
         return expenses
     except Exception as e:
@@ -1,9 +1,9 @@
 # app/routers/groups.py
 import logging
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app import models, schemas
+from app import crud, fx, models, schemas
 from app.auth import get_current_user
 
 # Configure logger
@@ -19,10 +19,19 @@ def create_group(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    try:
-        logger.info(f"User {current_user.id} is creating a group with name '{group.name}'")
+    logger.info(f"User {current_user.id} is creating a group with name '{group.name}'")
+
+    # Balances roll up into the default currency, so the base must convert into it
+    base_currency = group.base_currency.upper()
+    if not fx.rates.supports(db, base_currency, fx.DEFAULT_CURRENCY):
+        raise HTTPException(status_code=400, detail=f"Unsupported currency {base_currency}")
 
-        db_group = models.Group(name=group.name, created_by_id=current_user.id)
+    try:
+        db_group = models.Group(
+            name=group.name,
+            base_currency=base_currency,
+            created_by_id=current_user.id,
+        )
         db.add(db_group)
         db.commit()
         db.refresh(db_group)
@@ -30,6 +39,8 @@ def create_group(
         # Add creator as member
         group_member = models.GroupMember(group_id=db_group.id, user_id=current_user.id)
         db.add(group_member)
+        db.flush()
+        crud.record_changes(db, db_group.id, [("member", group_member.id, "insert")])
         db.commit()
 
         logger.info(f"Group created successfully with ID {db_group.id}")
@@ -59,9 +70,75 @@ def list_groups(
         raise HTTPException(status_code=500, detail="Failed to fetch groups")
 
 
+@router.get("/balances", response_model=dict[int, schemas.GroupBalancesOut])
+def get_groups_balances(
+    ids: str = Query(..., description="Comma-separated group IDs, or 'all'"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Balances for many groups in one request, keyed by group ID.
+    Authorization, membership and balances are each loaded with a single query.
+    """
+    logger.info(f"User {current_user.id} is requesting balances for groups ids={ids}")
+    if ids.strip().lower() == "all":
+        group_ids = None
+    else:
+        try:
+            group_ids = sorted({int(i) for i in ids.split(",") if i.strip()})
+        except ValueError:
+            logger.warning(f"Invalid group ids '{ids}' from user {current_user.id}")
+            raise HTTPException(status_code=400, detail="ids must be comma-separated integers or 'all'")
+        if not group_ids:
+            raise HTTPException(status_code=400, detail="No group ids given")
+
+    try:
+        existing, allowed = crud.get_authorized_group_ids(db, current_user.id, group_ids)
+    except Exception as e:
+        logger.error(f"Error resolving groups {ids} for user {current_user.id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch balances")
+
+    if group_ids is not None:
+        missing = [g for g in group_ids if g not in existing]
+        if missing:
+            logger.warning(f"Groups {missing} not found for user {current_user.id}")
+            raise HTTPException(status_code=404, detail=f"Groups not found: {missing}")
+        forbidden = [g for g in group_ids if g not in allowed]
+        if forbidden:
+            logger.warning(f"Unauthorized access: User {current_user.id} tried accessing groups {forbidden}")
+            raise HTTPException(status_code=403, detail=f"Not a member of groups: {forbidden}")
+
+    try:
+        allowed_ids = sorted(allowed)
+        members = crud.get_group_members_bulk(db, allowed_ids)
+        net = crud.get_net_balances_bulk(db, allowed_ids)
+        result = {
+            group_id: schemas.GroupBalancesOut(
+                group_id=group_id,
+                name=existing[group_id][0],
+                currency=existing[group_id][1],
+                balances=[
+                    schemas.BalanceOut(
+                        user_id=user_id,
+                        username=username,
+                        balance=round(net[group_id].get(user_id, 0.0), 2),
+                    )
+                    for user_id, username in members[group_id]
+                ],
+            )
+            for group_id in allowed_ids
+        }
+        logger.info(f"Computed balances for {len(result)} groups for user {current_user.id}")
+        return result
+    except Exception as e:
+        logger.error(f"Error computing balances for groups {ids}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch balances")
+
+
 @router.get("/{group_id}/expenses", response_model=list[schemas.ExpenseOut])
 def get_group_expenses(
     group_id: int,
+    include_archived: bool = False,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
@@ -71,12 +148,83 @@ def get_group_expenses(
         logger.warning(f"Group {group_id} not found for user {current_user.id}")
         raise HTTPException(status_code=404, detail="Group not found")
 
-    if current_user not in group.members:
+    member = (
+        db.query(models.GroupMember)
+        .filter(models.GroupMember.group_id == group_id, models.GroupMember.user_id == current_user.id)
+        .first()
+    )
+    if not member:
+        logger.warning(f"Unauthorized access: User {current_user.id} tried accessing group {group_id}")
+        raise HTTPException(status_code=403, detail="Not a member of this group")
+
+    if not include_archived:
+        logger.info(f"Returning {len(group.expenses)} expenses for group {group_id}")
+        return group.expenses
+
+    try:
+        expenses = crud.get_expenses(db, group_id=group_id, include_archived=True)
+        logger.info(f"Returning {len(expenses)} expenses (incl. archived) for group {group_id}")
+        return expenses
+    except Exception as e:
+        logger.error(f"Error fetching archived expenses for group {group_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch expenses")
+
+
+@router.get("/{group_id}/activity", response_model=list[schemas.ActivityOut])
+def get_group_activity(
+    group_id: int,
+    type: str = Query("all", pattern="^(all|expense|settlement)$"),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    logger.info(f"User {current_user.id} is requesting {type} activity for group {group_id}")
+    member = (
+        db.query(models.GroupMember)
+        .filter(models.GroupMember.group_id == group_id, models.GroupMember.user_id == current_user.id)
+        .first()
+    )
+    if not member:
+        logger.warning(f"Unauthorized access: User {current_user.id} tried accessing group {group_id}")
+        raise HTTPException(status_code=403, detail="Not a member of this group")
+
+    try:
+        return crud.get_group_activity(db, group_id, entry_type=type, limit=limit)
+    except Exception as e:
+        logger.error(f"Error fetching activity for group {group_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch activity")
+
+
+@router.get("/{group_id}/changes", response_model=schemas.ChangesPage)
+def get_group_changes(
+    group_id: int,
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    logger.info(f"User {current_user.id} is syncing group {group_id} since seq {since}")
+    member = (
+        db.query(models.GroupMember)
+        .filter(models.GroupMember.group_id == group_id, models.GroupMember.user_id == current_user.id)
+        .first()
+    )
+    if not member:
         logger.warning(f"Unauthorized access: User {current_user.id} tried accessing group {group_id}")
         raise HTTPException(status_code=403, detail="Not a member of this group")
 
-    logger.info(f"Returning {len(group.expenses)} expenses for group {group_id}")
-    return group.expenses
+    try:
+        changes, has_more = crud.get_group_changes(db, group_id, since=since, limit=limit)
+        logger.info(f"Returning {len(changes)} changes for group {group_id} (has_more={has_more})")
+        return {
+            "group_id": group_id,
+            "changes": changes,
+            "next_since": changes[-1]["seq"] if changes else since,
+            "has_more": has_more,
+        }
+    except Exception as e:
+        logger.error(f"Error fetching changes for group {group_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch changes")
 
 
 @router.get("/{group_id}/balances")
@@ -99,7 +247,7 @@ def get_group_balances(
         balances = (
             db.query(models.Balance)
             .join(models.User, models.User.id == models.Balance.user_id)
-            .filter(models.Balance.user_id.in_([m.id for m in group.members]))
+            .filter(models.Balance.group_id == group_id)
             .all()
         )
         logger.info(f"Found {len(balances)} balances for group {group_id}")
@@ -0,0 +1,132 @@
+# app/routers/recurring.py
+import logging
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app import fx, models, schemas
+from app.auth import get_current_user
+from app.recurring import CronSchedule
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+router = APIRouter(prefix="/recurring", tags=["recurring"])
+
+
+def _require_member(db: Session, group_id: int, user_id: int):
+    return (
+        db.query(models.GroupMember)
+        .filter(models.GroupMember.group_id == group_id, models.GroupMember.user_id == user_id)
+        .first()
+    )
+
+
+@router.post("/", response_model=schemas.RecurringExpenseOut)
+def create_recurring_expense(
+    template: schemas.RecurringExpenseCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    logger.info(f"User {current_user.id} is creating recurring expense '{template.description}'")
+
+    # Schedules run on naive UTC; catch-up covers scheduler downtime, not
+    # backfill, so a start in the past is clamped to now
+    now = datetime.utcnow()
+    start_at = template.start_at or now
+    if start_at.tzinfo is not None:
+        start_at = start_at.astimezone(timezone.utc).replace(tzinfo=None)
+    if start_at < now:
+        logger.info(f"start_at {start_at} is in the past, starting from {now}")
+        start_at = now
+    try:
+        schedule = CronSchedule(template.schedule)
+        # A schedule can parse and still never fire (e.g. "0 0 31 2 *")
+        next_run_at = schedule.next_after(start_at - timedelta(minutes=1))
+    except ValueError as e:
+        logger.warning(f"Invalid schedule '{template.schedule}': {e}")
+        raise HTTPException(status_code=400, detail=f"Invalid schedule: {e}")
+
+    group = db.query(models.Group).filter(models.Group.id == template.group_id).first()
+    if not group:
+        logger.warning(f"Group {template.group_id} not found")
+        raise HTTPException(status_code=404, detail="Group not found")
+    if not _require_member(db, template.group_id, current_user.id):
+        logger.warning(f"Unauthorized access: User {current_user.id} tried accessing group {template.group_id}")
+        raise HTTPException(status_code=403, detail="Not a member of this group")
+
+    if not template.split_between:
+        raise HTTPException(status_code=400, detail="split_between must not be empty")
+    member_ids = {
+        m[0] for m in db.query(models.GroupMember.user_id)
+        .filter(models.GroupMember.group_id == template.group_id).all()
+    }
+    for user_id in [template.paid_by_id, *template.split_between]:
+        if user_id not in member_ids:
+            logger.warning(f"User {user_id} not in group {template.group_id}")
+            raise HTTPException(status_code=400, detail=f"User {user_id} not in group")
+
+    currency = template.currency.upper()
+    if not fx.rates.supports(db, currency, group.base_currency):
+        raise HTTPException(status_code=400, detail=f"Unsupported currency {currency}")
+
+    try:
+        db_template = models.RecurringExpense(
+            description=template.description,
+            amount=template.amount,
+            currency=currency,
+            paid_by_id=template.paid_by_id,
+            group_id=template.group_id,
+            split_between=list(template.split_between),
+            schedule=template.schedule,
+            next_run_at=next_run_at,
+            created_by_id=current_user.id,
+        )
+        db.add(db_template)
+        db.commit()
+        db.refresh(db_template)
+        logger.info(f"Recurring expense {db_template.id} created, first run at {db_template.next_run_at}")
+        return db_template
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error creating recurring expense for group {template.group_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to create recurring expense")
+
+
+@router.get("/group/{group_id}", response_model=list[schemas.RecurringExpenseOut])
+def list_recurring_expenses(
+    group_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    if not _require_member(db, group_id, current_user.id):
+        logger.warning(f"Unauthorized access: User {current_user.id} tried accessing group {group_id}")
+        raise HTTPException(status_code=403, detail="Not a member of this group")
+    templates = (
+        db.query(models.RecurringExpense)
+        .filter(models.RecurringExpense.group_id == group_id)
+        .order_by(models.RecurringExpense.id)
+        .all()
+    )
+    logger.info(f"Returning {len(templates)} recurring expenses for group {group_id}")
+    return templates
+
+
+@router.delete("/{recurring_id}", response_model=schemas.RecurringExpenseOut)
+def stop_recurring_expense(
+    recurring_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    template = db.query(models.RecurringExpense).filter(models.RecurringExpense.id == recurring_id).first()
+    if not template:
+        raise HTTPException(status_code=404, detail="Recurring expense not found")
+    if not _require_member(db, template.group_id, current_user.id):
+        logger.warning(f"Unauthorized access: User {current_user.id} tried stopping recurring {recurring_id}")
+        raise HTTPException(status_code=403, detail="Not a member of this group")
+
+    template.active = False
+    db.commit()
+    db.refresh(template)
+    logger.info(f"Recurring expense {recurring_id} stopped by user {current_user.id}")
+    return template
@@ -1,8 +1,9 @@
 # app/routers/settlements.py
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
 from app.database import get_db
-from app import models, schemas
+from app import crud, fx, models, schemas
 from app.auth import get_current_user
 import logging
 
@@ -11,7 +12,7 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/settlements", tags=["settlements"])
 
 
-@router.post("/", response_model=schemas.ExpenseOut)
+@router.post("/", response_model=schemas.SettlementOut)
 def settle_up(
     request: schemas.SettleUpRequest,
     db: Session = Depends(get_db),
@@ -30,6 +31,10 @@ def settle_up(
         logger.warning("Attempted settlement with non-positive amount")
         raise HTTPException(status_code=400, detail="Amount must be positive")
 
+    if request.payer_id == request.payee_id:
+        logger.warning(f"Attempted settlement of user {request.payer_id} with themselves")
+        raise HTTPException(status_code=400, detail="Payer and payee must be different users")
+
     # Validate group
     group = db.query(models.Group).filter(models.Group.id == request.group_id).first()
     if not group:
@@ -58,32 +63,58 @@ def settle_up(
         logger.error("One or both users not in group")
         raise HTTPException(status_code=400, detail="Both users must be in the group")
 
-    # Record settlement as an expense
-    settlement_expense = models.Expense(
-        description=f"Settlement: User {request.payer_id} paid User {request.payee_id}",
-        amount=request.amount,
-        paid_by_id=request.payer_id,
-        group_id=request.group_id,
-    )
-    db.add(settlement_expense)
-    db.commit()
-    db.refresh(settlement_expense)
-
-    # Create expense shares
-    payer_share = models.ExpenseShare(
-        expense_id=settlement_expense.id,
-        user_id=request.payer_id,
-        amount=0,
-    )
-    payee_share = models.ExpenseShare(
-        expense_id=settlement_expense.id,
-        user_id=request.payee_id,
-        amount=-request.amount,  # Negative = reduces how much they’re owed
-    )
-    db.add_all([payer_share, payee_share])
-    db.commit()
-    db.refresh(settlement_expense)
+    currency = (request.currency or group.base_currency).upper()
+    if not fx.rates.supports(db, currency, group.base_currency):
+        raise HTTPException(status_code=400, detail=f"Unsupported currency {currency}")
+
+    try:
+        settlement = models.Settlement(
+            group_id=request.group_id,
+            payer_id=request.payer_id,
+            payee_id=request.payee_id,
+            amount=request.amount,
+            currency=currency,
+        )
+        db.add(settlement)
+        db.flush()
+
+        # Paying reduces what the payer owes the payee
+        paid = fx.rates.convert(request.amount, currency, group.base_currency, settlement.created_at)
+        crud.apply_balance_deltas(db, {(request.group_id, request.payer_id, request.payee_id): -paid})
+        crud.record_changes(db, request.group_id, [("settlement", settlement.id, "insert")])
+
+        db.commit()
+        db.refresh(settlement)
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Database error while recording settlement: {e}")
+        raise HTTPException(status_code=500, detail="Database error")
+
+    logger.info(f"Settlement recorded successfully (id={settlement.id})")
 
-    logger.info(f"Settlement recorded successfully (id={settlement_expense.id})")
+    return settlement
+
+
+@router.get("/group/{group_id}", response_model=list[schemas.SettlementOut])
+def get_group_settlements(
+    group_id: int,
+    include_archived: bool = False,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    member = (
+        db.query(models.GroupMember)
+        .filter(models.GroupMember.group_id == group_id, models.GroupMember.user_id == current_user.id)
+        .first()
+    )
+    if not member:
+        logger.warning(f"Unauthorized access: User {current_user.id} tried accessing group {group_id}")
+        raise HTTPException(status_code=403, detail="Not a member of this group")
 
-    return settlement_expense
+    try:
+        settlements = crud.get_settlements(db, group_id, include_archived=include_archived)
+        logger.info(f"Returning {len(settlements)} settlements for group {group_id}")
+        return settlements
+    except Exception as e:
+        logger.error(f"Error fetching settlements for group {group_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch settlements")
@@ -2,7 +2,7 @@
 import logging
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from app import crud, schemas, database, models
+from app import crud, fx, schemas, database
 from app.auth import get_current_user
 
 # Configure logger
@@ -61,31 +61,29 @@ def get_my_balance(
     total_balance = 0.0
 
     try:
-        # Query all groups the user is a member of
-        groups = (
-            db.query(models.Group)
-            .join(models.GroupMember)
-            .filter(models.GroupMember.user_id == current_user.id)
-            .all()
-        )
-        logger.info(f"User {current_user.id} is part of {len(groups)} groups")
+        # All of the user's groups and their balances in a fixed number of queries
+        groups, group_ids = crud.get_authorized_group_ids(db, current_user.id)
+        logger.info(f"User {current_user.id} is part of {len(group_ids)} groups")
+        net = crud.get_net_balances_bulk(db, sorted(group_ids))
 
-        for group in groups:
-            group_balance = 0.0
-            for expense in group.expenses:
-                split_amount = expense.amount / len(group.members)
-                if expense.payer_id == current_user.id:
-                    group_balance += expense.amount - split_amount
-                else:
-                    group_balance -= split_amount
-            balances[group.name] = group_balance
-            total_balance += group_balance
+        # Per-group balances stay in the group's base currency; the total is
+        # converted into the default currency
+        per_group = []
+        for group_id in group_ids:
+            name, base_currency = groups[group_id]
+            group_balance = net[group_id].get(current_user.id, 0.0)
+            balances[name] = round(group_balance, 2)
+            per_group.append((base_currency, None, group_balance))
+        if any(currency != fx.DEFAULT_CURRENCY for currency, _, _ in per_group):
+            fx.rates.ensure_loaded(db)
+        total_balance = round(fx.rates.convert_totals(per_group, fx.DEFAULT_CURRENCY), 2)
 
         logger.info(f"Balance calculation complete for user {current_user.id}")
         return {
             "user": current_user.username,
             "balances_per_group": balances,
             "total_balance": total_balance,
+            "currency": fx.DEFAULT_CURRENCY,
         }
     except Exception as e:
         logger.error(f"Error calculating balances for user {current_user.id}: {e}")
@@ -1,6 +1,7 @@
 import logging
+from datetime import datetime
 from typing import List, Optional
-from pydantic import BaseModel, EmailStr, ValidationError
+from pydantic import BaseModel, EmailStr, Field, ValidationError
 from pydantic import ConfigDict
 
 # Configure logger
@@ -62,6 +63,7 @@ class ExpenseShareOut(ExpenseShareBase):
 class ExpenseBase(LoggedModel):
     description: str
     amount: float
+    currency: str = "INR"
     paid_by_id: int
     group_id: Optional[int] = None
 
@@ -82,6 +84,7 @@ class ExpenseOut(ExpenseBase):
 # -------------------------
 class GroupBase(LoggedModel):
     name: str
+    base_currency: str = Field("INR", min_length=3, max_length=3)
 
 
 class GroupCreate(GroupBase):
@@ -107,8 +110,101 @@ class BalanceOut(LoggedModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class GroupBalancesOut(LoggedModel):
+    group_id: int
+    name: str
+    currency: str
+    balances: List[BalanceOut]
+
+
 class SettleUpRequest(LoggedModel):
     group_id: int
     payer_id: int
     payee_id: int
     amount: float
+    currency: Optional[str] = None   # defaults to the group's base currency
+
+
+class SettlementOut(LoggedModel):
+    id: int
+    group_id: int
+    payer_id: int
+    payee_id: int
+    amount: float
+    currency: str
+    created_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ActivityOut(LoggedModel):
+    entry_type: str   # "expense" or "settlement"
+    id: int
+    group_id: int
+    description: Optional[str] = None
+    amount: float
+    currency: str
+    paid_by_id: int
+    payee_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+
+
+# -------------------------
+# Delta Sync Schemas
+# -------------------------
+class ChangeOut(LoggedModel):
+    seq: int
+    entity_type: str   # expense, expense_share, settlement, member
+    entity_id: int
+    op: str            # insert, update, delete (tombstone, data is null)
+    data: Optional[dict] = None
+
+
+class ChangesPage(LoggedModel):
+    group_id: int
+    changes: List[ChangeOut]
+    next_since: int    # pass as ?since= to fetch the next page
+    has_more: bool
+
+
+# -------------------------
+# Recurring Expense Schemas
+# -------------------------
+class RecurringExpenseBase(LoggedModel):
+    description: str
+    amount: float
+    currency: str = "INR"
+    paid_by_id: int
+    group_id: int
+    split_between: List[int]
+    schedule: str   # cron expression: minute hour day-of-month month day-of-week
+
+
+class RecurringExpenseCreate(RecurringExpenseBase):
+    start_at: Optional[datetime] = None   # first occurrence is the next match after this (not before now)
+
+
+class RecurringExpenseOut(RecurringExpenseBase):
+    id: int
+    next_run_at: datetime
+    last_run_at: Optional[datetime] = None
+    active: bool
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+# -------------------------
+# Startup warmup
+# -------------------------
+def warm_validators():
+    """Validate one sample of each hot response schema so first requests skip lazy setup."""
+    user = {"id": 0, "username": "warmup", "email": "warmup@example.com"}
+    ExpenseOut(
+        id=0, description="warmup", amount=0.0, paid_by_id=0,
+        shares=[{"id": 0, "user_id": 0, "amount": 0.0}],
+    )
+    GroupOut(id=0, name="warmup", created_by_id=0, members=[user])
+    GroupBalancesOut(
+        group_id=0, name="warmup", currency="INR",
+        balances=[{"user_id": 0, "username": "warmup", "balance": 0.0}],
+    )
@@ -0,0 +1,187 @@
+# benchmarks/balance_contention.py
+"""
+Concurrent-writer stress test for pairwise balance updates in one hot group.
+
+Every writer thread commits small balance deltas onto the same few pairs of
+a single group. After each run the stored totals are compared with the sum
+of all committed deltas, so any lost update shows up as a non-zero "lost"
+column. Modes:
+
+    atomic       apply_balance_deltas only
+    legacy       the old read-modify-write update, for comparison
+    expense      the full expense write path: expense row, add_expense_shares,
+                 apply_balance_deltas and record_expense_changes per commit
+    expense-noseq  the same without record_expense_changes, to isolate the
+                 cost of per-group change sequencing (groups.change_seq)
+
+In the expense modes the group's change log is also checked for gaps.
+
+Usage (from the hisaab/ directory, with DATABASE_URL pointing at a test DB):
+    python benchmarks/balance_contention.py --writers 1 8 64 --writes 200
+    python benchmarks/balance_contention.py --mode expense --writers 1 8 64
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func, select  # noqa: E402
+from sqlalchemy.exc import IntegrityError, OperationalError  # noqa: E402
+
+from app import crud, models, database  # noqa: E402
+
+MEMBERS = 4
+MAX_RETRIES = 50
+
+
+def setup_group():
+    """Create a fresh group with MEMBERS users; returns (group_id, [user_ids])."""
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try:
+        tag = uuid.uuid4().hex[:8]
+        users = [
+            models.User(username=f"bench_{tag}_{i}", email=f"bench_{tag}_{i}@example.com", password_hash="x")
+            for i in range(MEMBERS)
+        ]
+        db.add_all(users)
+        db.flush()
+        group = models.Group(name=f"bench_{tag}", created_by_id=users[0].id)
+        db.add(group)
+        db.flush()
+        db.add_all([models.GroupMember(group_id=group.id, user_id=u.id) for u in users])
+        db.commit()
+        return group.id, [u.id for u in users]
+    finally:
+        db.close()
+
+
+def legacy_apply(db, deltas):
+    """The previous read-modify-write update, kept for comparison."""
+    for (group_id, user_id, owes_to_id), amount in deltas.items():
+        balance = db.query(models.Balance).filter_by(
+            group_id=group_id, user_id=user_id, owes_to_id=owes_to_id
+        ).first()
+        if balance:
+            balance.amount += amount
+        else:
+            db.add(models.Balance(group_id=group_id, user_id=user_id, owes_to_id=owes_to_id, amount=amount))
+
+
+def write_atomic(db, group_id, debtor, payer):
+    crud.apply_balance_deltas(db, {(group_id, debtor, payer): 1.0})
+
+
+def write_legacy(db, group_id, debtor, payer):
+    legacy_apply(db, {(group_id, debtor, payer): 1.0})
+
+
+def write_expense(db, group_id, debtor, payer, sequenced=True):
+    """What POST /expenses does: an expense of 2.0 split with the payer, so debtor owes 1.0."""
+    expense = models.Expense(description="bench", amount=2.0, paid_by_id=payer, group_id=group_id)
+    db.add(expense)
+    db.flush()
+    crud.apply_balance_deltas(db, crud.add_expense_shares(db, expense, [debtor, payer], expense.currency))
+    if sequenced:
+        crud.record_expense_changes(db, [expense])
+
+
+MODES = {
+    "atomic": write_atomic,
+    "legacy": write_legacy,
+    "expense": write_expense,
+    "expense-noseq": lambda db, group_id, debtor, payer: write_expense(db, group_id, debtor, payer, False),
+}
+
+
+def sequence_gaps(group_id):
+    """Missing or extra seqs in the group's change log (0 when contiguous from 1)."""
+    db = database.SessionLocal()
+    try:
+        count, highest = db.execute(
+            select(func.count(), func.max(models.GroupChange.seq)).where(models.GroupChange.group_id == group_id)
+        ).one()
+        return (highest or 0) - count
+    finally:
+        db.close()
+
+
+def total(group_id):
+    db = database.SessionLocal()
+    try:
+        return sum(b.amount for b in db.query(models.Balance).filter(models.Balance.group_id == group_id))
+    finally:
+        db.close()
+
+
+def run(writers, writes, mode, group_id, user_ids):
+    write = MODES[mode]
+    payer = user_ids[0]
+    committed = [0] * writers
+    retries = [0] * writers
+    before = total(group_id)
+
+    def writer(index):
+        db = database.SessionLocal()
+        try:
+            for n in range(writes):
+                debtor = user_ids[1 + (index + n) % (len(user_ids) - 1)]
+                for _ in range(MAX_RETRIES):
+                    try:
+                        write(db, group_id, debtor, payer)
+                        db.commit()
+                        committed[index] += 1
+                        break
+                    except (OperationalError, IntegrityError):
+                        # e.g. SQLite "database is locked" or a legacy insert race: roll back, retry
+                        db.rollback()
+                        retries[index] += 1
+                        time.sleep(0.001)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    applied = total(group_id) - before
+    done = sum(committed)
+    return done, done - applied, sum(retries), elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stress concurrent balance updates on one group")
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--writes", type=int, default=200, help="commits per writer")
+    parser.add_argument("--mode", choices=list(MODES), default="atomic")
+    args = parser.parse_args(argv)
+
+    # One pooled connection per writer, so runs measure the database, not pool waits
+    database.SessionLocal.configure(bind=create_engine(
+        database.DATABASE_URL, pool_size=max(args.writers), max_overflow=0, pool_pre_ping=True
+    ))
+    group_id, user_ids = setup_group()
+    print(f"mode={args.mode} group={group_id} db={database.engine.url.get_backend_name()}")
+    print(f"{'writers':>8}{'commits':>10}{'lost':>8}{'retries':>9}{'seconds':>10}{'commits/s':>11}")
+    failed = False
+    for writers in args.writers:
+        done, lost, retries, elapsed = run(writers, args.writes, args.mode, group_id, user_ids)
+        failed = failed or abs(lost) > 1e-6
+        print(f"{writers:>8}{done:>10}{lost:>8.0f}{retries:>9}{elapsed:>10.2f}{done / elapsed:>11.0f}")
+    if args.mode == "expense":
+        gaps = sequence_gaps(group_id)
+        print(f"change log gaps: {gaps}")
+        failed = failed or gaps != 0
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+# benchmarks/startup.py
+"""
+Startup-time benchmark: cold import of app.main, app startup (lifespan warmup)
+and the first request, each measured in a fresh interpreter.
+
+Usage (from the hisaab/ directory, with DATABASE_URL pointing at a test DB):
+    python benchmarks/startup.py --runs 5 --path /readyz
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside a fresh interpreter so every measurement is a cold start
+PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from app.main import create_app
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+app = create_app()
+with TestClient(app) as client:
+    t2 = time.perf_counter()
+    status = client.get(sys.argv[1]).status_code
+    t3 = time.perf_counter()
+print(json.dumps({
+    "import": t1 - t0,
+    "startup": t2 - t1,
+    "first_request": t3 - t2,
+    "total": t3 - t0,
+    "status": status,
+}))
+"""
+
+
+def run_once(path):
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE, path],
+        cwd=APP_DIR, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold import + first request time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/readyz", help="path requested after startup")
+    args = parser.parse_args(argv)
+
+    results = [run_once(args.path) for _ in range(args.runs)]
+    print(f"{'phase':<15}{'median ms':>12}{'max ms':>12}")
+    for phase in ("import", "startup", "first_request", "total"):
+        values = [r[phase] * 1000 for r in results]
+        print(f"{phase:<15}{statistics.median(values):>12.1f}{max(values):>12.1f}")
+    print(f"statuses: {sorted({r['status'] for r in results})}")
+
+
+if __name__ == "__main__":
+    main()